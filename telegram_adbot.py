@@ -1,17 +1,23 @@
 import os
 import logging
 import asyncio
-import json
 import time
 import random
-from typing import Dict, List, Optional, Set
+import re
+import heapq
+import itertools
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
 from telethon import TelegramClient, errors, events
 from telethon.tl.types import Channel, Chat, User
 from telethon.tl.custom import Button
 from dotenv import load_dotenv
 import sqlite3
-from dataclasses import dataclass, asdict
+import aiosqlite
+import orjson
+from aiosqlitepool import SQLiteConnectionPool
+from dataclasses import dataclass
 import traceback
 
 # Load environment variables
@@ -20,6 +26,84 @@ load_dotenv()
 DEFAULT_SEND_INTERVAL = 5
 MAX_ACCOUNTS = 10
 FLOOD_WAIT_TOLERANCE = 300  # 5 minutes max flood wait
+DB_WRITE_BATCH = 128  # Queued writes committed per transaction by the background writer
+DB_WRITE_INTERVAL = 0.5  # Seconds the writer waits to fill a batch before committing
+ACCOUNT_FLUSH_SENDS = 50  # Unsaved sends after which an account's counter is written
+ACCOUNT_FLUSH_INTERVAL = 10  # Seconds after which all unsaved send counters are written
+CLIENT_INIT_CONCURRENCY = 10  # Account clients connected in parallel per campaign
+ACCOUNT_CAMPAIGN_CONCURRENCY = 3  # Single-account campaign runs allowed at once on one account
+DIALOG_CACHE_TTL = 300  # Seconds a fetched dialog list is reused for target discovery
+TARGET_PAGE_SIZE = 100  # Dialogs filtered and handed to the sender at a time
+TARGET_SHUFFLE_WINDOW = 256  # Streamed targets held back to randomize send order
+MESSAGE_SAMPLE_BATCH = 32  # Campaign messages pre-drawn per random.choices call
+KEYWORD_REGEX_THRESHOLD = 4  # Keyword lists longer than this are matched with one compiled regex
+RENDER_CACHE_SIZE = 1024  # Bot messages whose last rendered menu hash is remembered
+STATS_CACHE_TTL = 3.0  # Seconds dashboard/statistics counters are served from memory
+BOT_RATE_LIMIT = 30  # Outgoing bot requests per second, Telegram's global bot limit
+PROGRESS_EDIT_INTERVAL = 2.0  # Minimum seconds between group-join progress edits
+
+# Applied to every SQLite connection before any transaction is opened
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=30000",
+)
+SQLITE_CACHED_STATEMENTS = 256
+
+# Hot-path statements kept as constants so the per-connection statement cache is hit
+_SQL_SAVE_ACCOUNT = '''
+    INSERT OR REPLACE INTO accounts
+    (name, session_file, status, last_used, flood_wait_until, messages_sent, errors_count, phone_number, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_SAVE_CAMPAIGN = '''
+    INSERT OR REPLACE INTO campaigns (id, name, data, created_at, user_id)
+    VALUES (?, ?, ?, ?, ?)
+'''
+_SQL_LOG_ACTIVITY = '''
+    INSERT INTO statistics (account_name, campaign_id, target_id, target_type, message_sent, timestamp, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+# Whole batch bound as one JSON array and expanded by json_each in a single statement
+_SQL_LOG_ACTIVITY_JSON = '''
+    INSERT INTO statistics (account_name, campaign_id, target_id, target_type, message_sent, timestamp, error)
+    SELECT value->>0, value->>1, value->>2, value->>3, value->>4, value->>5, value->>6
+    FROM json_each(?)
+'''
+SQLITE_JSON_BULK_INSERT = sqlite3.sqlite_version_info >= (3, 45, 0)
+# Account names are bound as one JSON array so the statement text (and its cached plan)
+# is the same for every user regardless of how many accounts they own
+_SQL_USER_STATS = '''
+    SELECT account_name,
+           SUM(message_sent = 1) AS sent,
+           SUM(message_sent = 0) AS failed,
+           SUM(message_sent = 1 AND DATE(timestamp) = ?) AS today_sent
+    FROM statistics
+    WHERE account_name IN (SELECT value FROM json_each(?))
+    GROUP BY account_name
+'''
+# Toggles the flag inside the stored JSON without re-encoding the whole campaign
+_SQL_SET_CAMPAIGN_ACTIVE = "UPDATE campaigns SET data = json_set(data, '$.active', json(?)) WHERE id = ?"
+_SQL_ADD_BLACKLIST = 'INSERT OR REPLACE INTO blacklist (target_id, reason, added_at) VALUES (?, ?, ?)'
+_SQL_UPDATE_ACCOUNT_SENT = 'UPDATE accounts SET messages_sent = ?, last_used = ? WHERE name = ?'
+_SQL_ADD_USER = 'INSERT OR IGNORE INTO users (user_id, added_at) VALUES (?, ?)'
+
+# Precomputed jitter rings indexed by a shared counter instead of drawing per sleep
+_JITTER_SIZE = 4096  # Power of two so the index wraps with a mask
+_SEND_JITTER = tuple(random.uniform(0.5, 2.0) for _ in range(_JITTER_SIZE))
+_JOIN_JITTER = tuple(random.uniform(5, 10) for _ in range(_JITTER_SIZE))
+_JITTER_IDX = itertools.count()
+
+# Account status labels shown in menus
+STATUS_DISPLAY = {
+    'active': 'ACTIVE',
+    'flood_wait': 'FLOOD_WAIT',
+    'banned': 'BANNED',
+    'error': 'ERROR'
+}
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +112,108 @@ logging.basicConfig(
 )
 logging.getLogger("telethon").setLevel(logging.CRITICAL)
 
+_GROUP_TYPES = (Chat, Channel)
+_USER_TYPE = User
+
+def _group_tag(entity) -> Optional[str]:
+    if isinstance(entity, _GROUP_TYPES) and (not isinstance(entity, Channel) or entity.megagroup):
+        return 'group'
+    return None
+
+def _dm_tag(entity) -> Optional[str]:
+    if isinstance(entity, _USER_TYPE) and not entity.bot and not entity.is_self:
+        return 'dm'
+    return None
+
+def _group_or_dm_tag(entity) -> Optional[str]:
+    return _group_tag(entity) or _dm_tag(entity)
+
+# Group link or username: t.me/joinchat/<hash>, t.me/+<hash>, t.me/<name>, @<name> or <name>.
+# Invite forms need the t.me/ prefix so a pasted +<phone number> is rejected.
+_GROUP_RE = re.compile(
+    r'(?:(?:https?://)?t\.me/(?:joinchat/|\+)(?P<invite>[\w-]+)|(?:(?:https?://)?t\.me/)?@?(?P<user>\w+))/?',
+    re.ASCII
+)
+
+def _keyword_matcher(keywords: List[str]) -> Callable[[str], bool]:
+    """Build a substring test for already-lowercased titles"""
+    lowered = [keyword.lower() for keyword in keywords]
+    if len(lowered) > KEYWORD_REGEX_THRESHOLD:
+        return re.compile('|'.join(map(re.escape, lowered))).search
+    return lambda title: any(keyword in title for keyword in lowered)
+
+async def _shuffle_window(items, size: int):
+    """Yield items from an async iterator in random order using a bounded window"""
+    window = []
+    async for item in items:
+        window.append(item)
+        if len(window) >= size:
+            # Swap a random entry to the end and emit it; O(1) per item
+            i = random.randrange(size)
+            window[i], window[-1] = window[-1], window[i]
+            yield window.pop()
+    
+    random.shuffle(window)
+    for item in window:
+        yield item
+
+async def _sleep_or_stop(stop: asyncio.Event, delay: float) -> bool:
+    """Sleep for delay seconds, returning True as soon as stop is set"""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=delay)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def _message_stream(messages: List[str]):
+    """Endlessly yield randomly chosen messages, drawn MESSAGE_SAMPLE_BATCH at a time"""
+    choices = tuple(messages) or ("Hello!",)
+    while True:
+        yield from random.choices(choices, k=MESSAGE_SAMPLE_BATCH)
+
+# Progress edit failures that are safe to ignore: unchanged text, deleted message, edit rate limit
+_PROGRESS_EDIT_ERRORS = (errors.MessageNotModifiedError, errors.MessageIdInvalidError, errors.FloodWaitError)
+
+# Telethon error classes per outcome; string tokens are only the fallback for anything else
+_ERROR_CLASSES = (
+    ('banned', (errors.UserDeactivatedBanError, errors.UserBannedInChannelError, errors.PhoneNumberBannedError,
+                errors.AuthKeyUnregisteredError, errors.SessionRevokedError)),
+    ('deleted', (errors.UserDeactivatedError, errors.InputUserDeactivatedError)),
+    ('flood', (errors.FloodError,)),
+    ('already', (errors.UserAlreadyParticipantError,)),
+)
+_ERROR_TOKENS = (
+    ('banned', ('banned', 'terminated')),
+    ('deleted', ('deleted', 'deactivated')),
+    ('flood', ('flood',)),
+    ('already', ('already',)),
+)
+
+def _classify_error(error: Exception) -> Optional[str]:
+    """Map an exception to 'banned', 'deleted', 'flood', 'already' or None"""
+    for kind, classes in _ERROR_CLASSES:
+        if isinstance(error, classes):
+            return kind
+    
+    message = str(error).lower()
+    for kind, tokens in _ERROR_TOKENS:
+        if any(token in message for token in tokens):
+            return kind
+    return None
+
+# Campaign mode -> function returning the target type tag, or None to skip the dialog
+_MODE_PREDICATES = {
+    'groups': _group_tag,
+    'dms': _dm_tag,
+    'both': _group_or_dm_tag,
+}
+
+_MODE_NAMES = {
+    'groups': 'Groups Only',
+    'dms': 'DMs Only',
+    'both': 'Both Groups & DMs',
+}
+
 @dataclass
 class Account:
     name: str
@@ -53,14 +239,59 @@ class Campaign:
     schedule: Optional[Dict] = None  # Start/end times, days
     filters: Optional[Dict] = None  # Target filters
     user_id: Optional[int] = None  # User who owns this campaign
-    
+
+class TokenBucket:
+    """Async token bucket; tokens refill lazily from the elapsed time on each acquire"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 class DatabaseManager:
     def __init__(self, db_path="adbot.db"):
         self.db_path = db_path
         self.init_database()
+        # Shared autocommit connection for UI queries, guarded by self.lock;
+        # WAL lets it run alongside the pooled writers
+        self.conn = self.connect(check_same_thread=False, isolation_level=None)
+        self.lock = asyncio.Lock()
+        # Blacklist is small and rarely changes - keep it in memory
+        self.blacklist: Set[str] = {row[0] for row in self.conn.execute('SELECT target_id FROM blacklist')}
+        # Long-lived connections reused across calls instead of reconnecting per query
+        self.pool = SQLiteConnectionPool(self._connect)
+    
+    def connect(self, **kwargs) -> sqlite3.Connection:
+        """Open a synchronous connection with the standard PRAGMAs applied"""
+        conn = sqlite3.connect(self.db_path, **kwargs)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    async def _configure(self, conn: aiosqlite.Connection):
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+    
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path, cached_statements=SQLITE_CACHED_STATEMENTS)
+        await self._configure(conn)
+        return conn
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         # Accounts table
@@ -127,31 +358,38 @@ class DatabaseManager:
             )
         ''')
         
+        # Users who have started the bot
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                added_at TEXT
+            )
+        ''')
+        
+        # Covers the per-account statistics aggregates
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_stats_acct_sent_ts ON statistics(account_name, message_sent, timestamp)')
+        
         conn.commit()
         conn.close()
     
-    def save_account(self, account: Account):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO accounts 
-            (name, session_file, status, last_used, flood_wait_until, messages_sent, errors_count, phone_number, user_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    @staticmethod
+    def _account_params(account: Account) -> tuple:
+        return (
             account.name, account.session_file, account.status,
             account.last_used.isoformat() if account.last_used else None,
             account.flood_wait_until.isoformat() if account.flood_wait_until else None,
             account.messages_sent, account.errors_count, account.phone_number, account.user_id
-        ))
-        conn.commit()
-        conn.close()
+        )
     
-    def get_accounts(self) -> List[Account]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM accounts')
-        rows = cursor.fetchall()
-        conn.close()
+    async def save_account(self, account: Account):
+        async with self.pool.connection() as conn:
+            await conn.execute(_SQL_SAVE_ACCOUNT, self._account_params(account))
+            await conn.commit()
+    
+    async def get_accounts(self) -> List[Account]:
+        async with self.pool.connection() as conn:
+            async with conn.execute('SELECT * FROM accounts') as cursor:
+                rows = await cursor.fetchall()
         
         accounts = []
         for row in rows:
@@ -165,53 +403,202 @@ class DatabaseManager:
             accounts.append(account)
         return accounts
     
-    def save_campaign(self, campaign: Campaign):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO campaigns (id, name, data, created_at, user_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (campaign.id, campaign.name, json.dumps(asdict(campaign)), datetime.now().isoformat(), campaign.user_id))
-        conn.commit()
-        conn.close()
+    async def save_campaign(self, campaign: Campaign):
+        data = orjson.dumps(campaign).decode()
+        async with self.pool.connection() as conn:
+            await conn.execute(_SQL_SAVE_CAMPAIGN, (campaign.id, campaign.name, data, datetime.now().isoformat(), campaign.user_id))
+            await conn.commit()
     
-    def get_campaigns(self) -> List[Campaign]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM campaigns')
-        rows = cursor.fetchall()
-        conn.close()
+    def get_user_ids(self) -> Set[int]:
+        return {row[0] for row in self.conn.execute('SELECT user_id FROM users')}
+    
+    async def set_campaign_active(self, campaign_id: str, active: bool):
+        async with self.pool.connection() as conn:
+            await conn.execute(_SQL_SET_CAMPAIGN_ACTIVE, ('true' if active else 'false', campaign_id))
+            await conn.commit()
+    
+    async def get_campaigns(self) -> List[Campaign]:
+        async with self.pool.connection() as conn:
+            async with conn.execute('SELECT data FROM campaigns') as cursor:
+                rows = await cursor.fetchall()
         
         campaigns = []
         for row in rows:
-            data = json.loads(row[0])
+            data = orjson.loads(row[0])
             campaign = Campaign(**data)
             campaigns.append(campaign)
         return campaigns
     
-    def log_activity(self, account_name: str, campaign_id: str, target_id: str, target_type: str, success: bool, error: Optional[str] = None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO statistics (account_name, campaign_id, target_id, target_type, message_sent, timestamp, error)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (account_name, campaign_id, str(target_id), target_type, success, datetime.now().isoformat(), error))
-        conn.commit()
-        conn.close()
+    async def add_to_blacklist(self, target_id: str, reason: Optional[str] = None):
+        async with self.pool.connection() as conn:
+            await conn.execute(_SQL_ADD_BLACKLIST, (str(target_id), reason, datetime.now().isoformat()))
+            await conn.commit()
+        self.blacklist.add(str(target_id))
+    
+    async def log_activity(self, account_name: str, campaign_id: str, target_id: str, target_type: str, success: bool, error: Optional[str] = None, timestamp: Optional[str] = None):
+        async with self.pool.connection() as conn:
+            await conn.execute(_SQL_LOG_ACTIVITY, (account_name, campaign_id, str(target_id), target_type, success, timestamp or datetime.now().isoformat(), error))
+            await conn.commit()
+    
+    async def write_batch(self, rows: List[tuple], accounts: List[Account], user_ids: List[int],
+                          sent_counts: List[Account] = ()):
+        """Insert statistics rows, save accounts, update send counters and add users in a single transaction"""
+        if not (rows or accounts or user_ids or sent_counts):
+            return
+        async with self.pool.connection() as conn:
+            await conn.execute('BEGIN IMMEDIATE')
+            if rows:
+                if SQLITE_JSON_BULK_INSERT:
+                    await conn.execute(_SQL_LOG_ACTIVITY_JSON, (orjson.dumps(rows).decode(),))
+                else:
+                    await conn.executemany(_SQL_LOG_ACTIVITY, rows)
+            if accounts:
+                await conn.executemany(_SQL_SAVE_ACCOUNT, [self._account_params(account) for account in accounts])
+            if sent_counts:
+                await conn.executemany(_SQL_UPDATE_ACCOUNT_SENT, [
+                    (account.messages_sent, account.last_used.isoformat() if account.last_used else None, account.name)
+                    for account in sent_counts
+                ])
+            if user_ids:
+                added_at = datetime.now().isoformat()
+                await conn.executemany(_SQL_ADD_USER, [(user_id, added_at) for user_id in user_ids])
+            await conn.commit()
+    
+    async def run_sync(self, func: Callable, *args):
+        """Run a blocking query on the shared connection in a worker thread"""
+        async with self.lock:
+            return await asyncio.to_thread(func, *args)
+    
+    def _fetch_dashboard_counts(self, today: str) -> Tuple[int, int]:
+        # Messages sent today
+        cursor = self.conn.execute('SELECT COUNT(*) FROM statistics WHERE DATE(timestamp) = ? AND message_sent = 1', (today,))
+        messages_today = cursor.fetchone()[0]
+        
+        # Total messages
+        cursor = self.conn.execute('SELECT COUNT(*) FROM statistics WHERE message_sent = 1')
+        total_messages = cursor.fetchone()[0]
+        return messages_today, total_messages
+    
+    def _fetch_user_stats(self, account_names: List[str], today: str) -> Tuple[int, int, int, List[tuple]]:
+        # Totals, today's count and the per-account breakdown in a single scan
+        cursor = self.conn.execute(_SQL_USER_STATS, (today, orjson.dumps(account_names).decode()))
+        rows = cursor.fetchall()
+        
+        total_sent = sum(row[1] for row in rows)
+        total_failed = sum(row[2] for row in rows)
+        today_sent = sum(row[3] for row in rows)
+        
+        # User's account performance - top 5 by messages sent
+        account_stats = sorted((row[:3] for row in rows), key=lambda row: row[1], reverse=True)[:5]
+        return total_sent, total_failed, today_sent, account_stats
+    
+    async def get_dashboard_counts(self, today: str) -> Tuple[int, int]:
+        """Messages sent today and in total"""
+        return await self.run_sync(self._fetch_dashboard_counts, today)
+    
+    async def get_user_stats(self, account_names: List[str], today: str) -> Tuple[int, int, int, List[tuple]]:
+        """Sent/failed/today totals and top account breakdown for the given accounts"""
+        return await self.run_sync(self._fetch_user_stats, account_names, today)
+    
+    def _delete_account(self, account_name: str):
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM accounts WHERE name = ?', (account_name,))
+            conn.execute('DELETE FROM statistics WHERE account_name = ?', (account_name,))
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    async def delete_account(self, account_name: str):
+        """Delete an account together with its statistics rows"""
+        await self.run_sync(self._delete_account, account_name)
+    
+    async def delete_campaign(self, campaign_id: str):
+        await self.run_sync(self.conn.execute, 'DELETE FROM campaigns WHERE id = ?', (campaign_id,))
+    
+    async def close(self):
+        """Close all pooled connections and the shared UI connection"""
+        await self.pool.close()
+        self.conn.close()
 
 class TelegramAdBot:
     def __init__(self):
         self.bot_token = os.getenv('BOT_TOKEN')
-        # Remove admin restrictions - this is now a public bot
-        self.authorized_users: Set[int] = set()  # Will track all users
-        
         self.db = DatabaseManager()
+        # Remove admin restrictions - this is now a public bot
+        self.authorized_users: Set[int] = self.db.get_user_ids()  # Will track all users
         self.accounts: Dict[str, Account] = {}
         self.clients: Dict[str, TelegramClient] = {}
+        self._client_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._per_account_sem: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(ACCOUNT_CAMPAIGN_CONCURRENCY)
+        )
         self.campaigns: Dict[str, Campaign] = {}
         self.running_campaigns: Set[str] = set()
+        # Campaign id -> accounts running it on their own ("<account>_<campaign>" keys above)
+        self.campaign_to_accounts: Dict[str, Set[str]] = {}
+        # "<account>_<campaign>" -> event set when that run is stopped, waking its sleeps
+        self._campaign_stop_events: Dict[str, asyncio.Event] = {}
+        # Names of accounts with status 'active' and ids of active campaigns
+        self.active_accounts: Set[str] = set()
+        self.active_campaigns: Set[str] = set()
+        
+        # Per-user indexes kept in sync with self.accounts / self.campaigns
+        self.accounts_by_user: Dict[Optional[int], Dict[str, Account]] = {}
+        self.campaigns_by_user: Dict[Optional[int], Dict[str, Campaign]] = {}
+        # Same, restricted to active accounts / campaigns
+        self._active_accounts_by_user: Dict[Optional[int], Dict[str, Account]] = {}
+        self._active_campaigns_by_user: Dict[Optional[int], Dict[str, Campaign]] = {}
+        # Per-user min-heaps of (messages_sent, name); stale entries are re-keyed or dropped lazily
+        self._active_heap: Dict[Optional[int], list] = defaultdict(list)
+        # Session file -> (monotonic fetch time, dialogs)
+        self._dialog_cache: Dict[str, Tuple[float, List]] = {}
+        # ('log', row) / ('account', account) / ('user', user_id) items for the background writer; None stops it
+        self._db_queue: asyncio.Queue = asyncio.Queue()
+        self._db_writer_task: Optional[asyncio.Task] = None
+        # Account name -> sends not yet written; flushed by the writer in bulk
+        self._account_dirty: Dict[str, int] = {}
+        # Account name -> loop.time() of its last send, turned into last_used when counters are written
+        self._last_used_ts: Dict[str, float] = {}
+        self._account_flush_at = time.monotonic() + ACCOUNT_FLUSH_INTERVAL
+        # User id -> (monotonic fetch time, get_user_stats result); dropped when new rows are written
+        self._stats_cache: Dict[Optional[int], Tuple[float, tuple]] = {}
+        # (monotonic fetch time, messages_today, total_messages)
+        self._dashboard_cache: Optional[Tuple[float, int, int]] = None
+        # In-progress statistics queries shared by concurrent refreshes
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # (chat id, message id) -> hash of the menu currently shown in that message
+        self._last_render: Dict[Tuple[int, int], int] = {}
+        # Ids of callback queries already answered by the handler currently serving them
+        self._answered_queries: Set[int] = set()
+        
+        # Static keyboards built once and reused by every render
+        self._dashboard_buttons = [
+            [Button.inline("Manage Accounts", b"accounts"), Button.inline("Campaigns", b"campaigns")],
+            [Button.inline("Statistics", b"statistics"), Button.inline("Settings", b"settings")],
+            [Button.inline("Refresh Dashboard", b"dashboard")]
+        ]
+        self._settings_buttons = [
+            [Button.inline("Clear Statistics", b"clear_stats")],
+            [Button.inline("Export Data", b"export_data")],
+            [Button.inline("Manage Blacklist", b"blacklist")],
+            [Button.inline("Back", b"dashboard")]
+        ]
+        self._accounts_footer = [
+            [Button.inline("➕ Add New Account", b"add_account")],
+            [Button.inline("🔗 Join Groups", b"join_groups")],
+            [Button.inline("Back to Dashboard", b"dashboard")]
+        ]
+        self._campaigns_footer = [
+            [Button.inline("➕ Create New Campaign", b"create_campaign")],
+            [Button.inline("⬅️ Back to Dashboard", b"dashboard")]
+        ]
         
         self.bot: Optional[TelegramClient] = None
+        # Shared by every handler so bursts across users stay under the bot limit
+        self._rate = TokenBucket(BOT_RATE_LIMIT)
         self.user_state: Dict[int, Dict] = {}
         self.stats = {
             'total_sent': 0,
@@ -220,18 +607,266 @@ class TelegramAdBot:
             'active_accounts': 0,
             'uptime_start': datetime.now()
         }
+    
+    def record_activity(self, account_name: str, campaign_id: str, target: Dict, success: bool,
+                        error: Optional[str] = None, timestamp: Optional[datetime] = None):
+        """Queue a statistics row for the background writer"""
+        self._db_queue.put_nowait(('log', (
+            account_name, campaign_id, str(target['id']), target['type'], success,
+            (timestamp or datetime.now()).isoformat(), error
+        )))
+    
+    def queue_account_save(self, account: Account):
+        """Queue an account save; repeated saves in one batch collapse into one write"""
+        self._db_queue.put_nowait(('account', account))
+    
+    def count_account_send(self, account: Account, sent_at: Optional[float] = None):
+        """Note a successful send; the counter is persisted later by the writer.
         
-        # Load existing data
-        self.load_accounts()
-        self.load_campaigns()
+        sent_at is a loop.time() reading; when given, account.last_used is
+        filled in from it at flush time instead of on every send.
+        """
+        self._account_dirty[account.name] = self._account_dirty.get(account.name, 0) + 1
+        if sent_at is not None:
+            self._last_used_ts[account.name] = sent_at
+    
+    def _take_due_counters(self, flush_all: bool = False) -> List[Account]:
+        now = time.monotonic()
+        if now >= self._account_flush_at:
+            flush_all = True
+            self._account_flush_at = now + ACCOUNT_FLUSH_INTERVAL
+        due = [name for name, count in self._account_dirty.items() if flush_all or count >= ACCOUNT_FLUSH_SENDS]
+        for name in due:
+            del self._account_dirty[name]
+        
+        if self._last_used_ts:
+            # One wall-clock reading converts every pending loop timestamp
+            wall_offset = time.time() - asyncio.get_running_loop().time()
+            for name in due:
+                sent_at = self._last_used_ts.pop(name, None)
+                if sent_at is not None and name in self.accounts:
+                    self.accounts[name].last_used = datetime.fromtimestamp(sent_at + wall_offset)
+        return [self.accounts[name] for name in due if name in self.accounts]
+    
+    async def write_db_items(self, items: List[tuple], flush_all: bool = False):
+        """Commit a batch of queued writes in one transaction"""
+        rows: List[tuple] = []
+        accounts: Dict[str, Account] = {}
+        user_ids: Set[int] = set()
+        for kind, item in items:
+            if kind == 'log':
+                rows.append(item)
+            elif kind == 'account':
+                # Accounts are written as they are at flush time, so the latest state wins
+                accounts[item.name] = item
+            else:
+                user_ids.add(item)
+        
+        # Full saves already carry the latest counters
+        sent_counts = [account for account in self._take_due_counters(flush_all) if account.name not in accounts]
+        
+        try:
+            await self.db.write_batch(rows, list(accounts.values()), list(user_ids), sent_counts)
+        except Exception as e:
+            logging.error(f"Failed to write {len(items)} queued database changes: {e}")
+            return
+        if rows:
+            self.invalidate_stats({self.accounts[row[0]].user_id for row in rows if row[0] in self.accounts})
+    
+    async def _db_writer(self):
+        queue = self._db_queue
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            if self._account_dirty:
+                # Wake up on time for pending send counters even if nothing else is queued
+                try:
+                    item = await asyncio.wait_for(queue.get(), ACCOUNT_FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    await self.write_db_items([])
+                    continue
+            else:
+                item = await queue.get()
+            if item is None:
+                return
+            items = [item]
+            deadline = loop.time() + DB_WRITE_INTERVAL
+            while len(items) < DB_WRITE_BATCH:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    # Stop requested: commit this batch first, then exit
+                    stopping = True
+                    break
+                items.append(item)
+            await self.write_db_items(items)
+    
+    async def stop_db_writer(self):
+        """Let the writer commit the batch it is filling, then wait for it to exit"""
+        task = self._db_writer_task
+        if task is None or task.done():
+            return
+        self._db_queue.put_nowait(None)
+        await task
+        self._db_writer_task = None
+    
+    async def flush_db_queue(self):
+        """Write everything still queued; used at shutdown after stop_db_writer()"""
+        items = []
+        while not self._db_queue.empty():
+            items.append(self._db_queue.get_nowait())
+        if items or self._account_dirty:
+            await self.write_db_items(items, flush_all=True)
+    
+    async def single_flight(self, key: tuple, factory):
+        """Run factory() once for all concurrent callers using the same key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller does not cancel the query for the others
+        return await asyncio.shield(task)
+    
+    def invalidate_stats(self, user_ids):
+        """Drop cached counters after statistics rows are written for these users"""
+        for user_id in user_ids:
+            self._stats_cache.pop(user_id, None)
+        self._dashboard_cache = None
     
     def get_user_accounts(self, user_id: int) -> List[Account]:
         """Get accounts owned by a specific user"""
-        return [acc for acc in self.accounts.values() if acc.user_id == user_id]
+        return list(self.accounts_by_user.get(user_id, {}).values())
     
     def get_user_campaigns(self, user_id: int) -> List[Campaign]:
         """Get campaigns owned by a specific user"""
-        return [camp for camp in self.campaigns.values() if camp.user_id == user_id]
+        return list(self.campaigns_by_user.get(user_id, {}).values())
+    
+    def get_user_active_accounts(self, user_id: int) -> List[Account]:
+        """Get a user's accounts whose status is 'active'"""
+        return list(self._active_accounts_by_user.get(user_id, {}).values())
+    
+    def get_user_active_campaigns(self, user_id: int) -> List[Campaign]:
+        """Get a user's active campaigns"""
+        return list(self._active_campaigns_by_user.get(user_id, {}).values())
+    
+    def _index_account_status(self, account: Account):
+        if account.status == "active":
+            self.active_accounts.add(account.name)
+            self._active_accounts_by_user.setdefault(account.user_id, {})[account.name] = account
+        else:
+            self.active_accounts.discard(account.name)
+            self._active_accounts_by_user.get(account.user_id, {}).pop(account.name, None)
+    
+    def _index_campaign_active(self, campaign: Campaign):
+        if campaign.active:
+            self.active_campaigns.add(campaign.id)
+            self._active_campaigns_by_user.setdefault(campaign.user_id, {})[campaign.id] = campaign
+        else:
+            self.active_campaigns.discard(campaign.id)
+            self._active_campaigns_by_user.get(campaign.user_id, {}).pop(campaign.id, None)
+    
+    def set_account_status(self, account: Account, status: str):
+        """Change an account's status and keep the active indexes in sync"""
+        account.status = status
+        self._index_account_status(account)
+    
+    async def set_campaign_active(self, campaign: Campaign, active: bool):
+        """Toggle a campaign, keep the active indexes in sync and persist the flag"""
+        campaign.active = active
+        self._index_campaign_active(campaign)
+        await self.db.set_campaign_active(campaign.id, active)
+    
+    def add_account(self, account: Account):
+        """Register an account and index it by owner"""
+        previous = self.accounts.get(account.name)
+        if previous is not None:
+            self.accounts_by_user.get(previous.user_id, {}).pop(account.name, None)
+            self._active_accounts_by_user.get(previous.user_id, {}).pop(account.name, None)
+        self.accounts[account.name] = account
+        self.accounts_by_user.setdefault(account.user_id, {})[account.name] = account
+        self._index_account_status(account)
+        self.push_active_account(account)
+    
+    def remove_account(self, account_name: str):
+        """Drop an account and its index entries"""
+        account = self.accounts.pop(account_name, None)
+        self.active_accounts.discard(account_name)
+        if account is not None:
+            self.accounts_by_user.get(account.user_id, {}).pop(account_name, None)
+            self._active_accounts_by_user.get(account.user_id, {}).pop(account_name, None)
+    
+    def set_account_owner(self, account: Account, user_id: Optional[int]):
+        """Change an account's owner and move it in the indexes"""
+        self.accounts_by_user.get(account.user_id, {}).pop(account.name, None)
+        self._active_accounts_by_user.get(account.user_id, {}).pop(account.name, None)
+        account.user_id = user_id
+        self.accounts_by_user.setdefault(user_id, {})[account.name] = account
+        self._index_account_status(account)
+        self.push_active_account(account)
+    
+    def push_active_account(self, account: Account):
+        """Offer an account for rotation with its current send count"""
+        if account.status != "active":
+            return
+        
+        heap = self._active_heap[account.user_id]
+        active = self._active_accounts_by_user.get(account.user_id, {})
+        if len(heap) >= 2 * len(active):
+            # Too many stale or duplicate entries - rebuild from the active index
+            heap[:] = [(acc.messages_sent, name) for name, acc in active.items()]
+            heapq.heapify(heap)
+        else:
+            heapq.heappush(heap, (account.messages_sent, account.name))
+    
+    def add_campaign(self, campaign: Campaign):
+        """Register a campaign and index it by owner"""
+        previous = self.campaigns.get(campaign.id)
+        if previous is not None:
+            self.campaigns_by_user.get(previous.user_id, {}).pop(campaign.id, None)
+            self._active_campaigns_by_user.get(previous.user_id, {}).pop(campaign.id, None)
+        self.campaigns[campaign.id] = campaign
+        self.campaigns_by_user.setdefault(campaign.user_id, {})[campaign.id] = campaign
+        self._index_campaign_active(campaign)
+    
+    def remove_campaign(self, campaign_id: str):
+        """Drop a campaign and its index entries"""
+        campaign = self.campaigns.pop(campaign_id, None)
+        self.active_campaigns.discard(campaign_id)
+        if campaign is not None:
+            self.campaigns_by_user.get(campaign.user_id, {}).pop(campaign_id, None)
+            self._active_campaigns_by_user.get(campaign.user_id, {}).pop(campaign_id, None)
+    
+    def mark_account_run(self, account_name: str, campaign_id: str) -> asyncio.Event:
+        """Record that a campaign is running on a single account; returns the run's stop event"""
+        running_key = f"{account_name}_{campaign_id}"
+        self.running_campaigns.add(running_key)
+        stop = self._campaign_stop_events[running_key] = asyncio.Event()
+        self.campaign_to_accounts.setdefault(campaign_id, set()).add(account_name)
+        return stop
+    
+    def clear_account_run(self, account_name: str, campaign_id: str, stop: Optional[asyncio.Event] = None):
+        """Forget a single-account run of a campaign; with stop, only if that run still owns the key"""
+        running_key = f"{account_name}_{campaign_id}"
+        if stop is not None and self._campaign_stop_events.get(running_key, stop) is not stop:
+            return
+        self.running_campaigns.discard(running_key)
+        stop = self._campaign_stop_events.pop(running_key, None)
+        if stop is not None:
+            stop.set()
+        account_names = self.campaign_to_accounts.get(campaign_id)
+        if account_names is not None:
+            account_names.discard(account_name)
+            if not account_names:
+                del self.campaign_to_accounts[campaign_id]
     
     def can_add_account(self, user_id: int) -> bool:
         """Check if user can add more accounts (unlimited for all users)"""
@@ -239,7 +874,9 @@ class TelegramAdBot:
     
     def add_user_to_authorized(self, user_id: int):
         """Add user to authorized users (public bot - all users are authorized)"""
-        self.authorized_users.add(user_id)
+        if user_id not in self.authorized_users:
+            self.authorized_users.add(user_id)
+            self._db_queue.put_nowait(('user', user_id))
     
     async def add_account_with_validation(self, user_id: int, account_name: str, session_file: str) -> bool:
         """Add account with user validation and 2-account limit"""
@@ -256,26 +893,27 @@ class TelegramAdBot:
         
         # Initialize and validate the account
         if await self.init_account_client(account):
-            self.accounts[account_name] = account
-            self.db.save_account(account)
+            self.add_account(account)
+            await self.db.save_account(account)
             return True
         
         return False
     
-    def load_accounts(self):
-        accounts = self.db.get_accounts()
+    async def load_accounts(self):
+        accounts = await self.db.get_accounts()
+        now = datetime.now()
         for account in accounts:
-            self.accounts[account.name] = account
             # Clean up flood waits that have expired
-            if account.flood_wait_until and datetime.now() > account.flood_wait_until:
-                account.status = "active"
+            if account.flood_wait_until and now > account.flood_wait_until:
+                self.set_account_status(account, "active")
                 account.flood_wait_until = None
-                self.db.save_account(account)
+                await self.db.save_account(account)
+            self.add_account(account)
     
-    def load_campaigns(self):
-        campaigns = self.db.get_campaigns()
+    async def load_campaigns(self):
+        campaigns = await self.db.get_campaigns()
         for campaign in campaigns:
-            self.campaigns[campaign.id] = campaign
+            self.add_campaign(campaign)
     
     async def init_bot(self):
         """Initialize bot client"""
@@ -293,6 +931,7 @@ class TelegramAdBot:
             
             # Register all event handlers
             self.register_handlers()
+            self._db_writer_task = asyncio.create_task(self._db_writer())
             logging.info("Bot initialized successfully")
             return True
         except Exception as e:
@@ -302,21 +941,96 @@ class TelegramAdBot:
     def register_handlers(self):
         """Register all event handlers"""
         if self.bot:
-            self.bot.add_event_handler(self.handle_start, events.NewMessage(pattern='/start'))
-            self.bot.add_event_handler(self.handle_help, events.NewMessage(pattern='/help'))
-            self.bot.add_event_handler(self.handle_accounts, events.NewMessage(pattern='/accounts'))
-            self.bot.add_event_handler(self.handle_campaigns, events.NewMessage(pattern='/campaigns'))
-            self.bot.add_event_handler(self.handle_stats, events.NewMessage(pattern='/stats'))
-            self.bot.add_event_handler(self.handle_settings, events.NewMessage(pattern='/settings'))
+            self._cmd_table = {
+                '/start': self.handle_start,
+                '/help': self.handle_help,
+                '/accounts': self.handle_accounts,
+                '/campaigns': self.handle_campaigns,
+                '/stats': self.handle_stats,
+                '/settings': self.handle_settings,
+            }
+            # Callback data matched exactly, then by prefix; prefix handlers get the remainder
+            self._cb_exact = {
+                "dashboard": self.show_dashboard,
+                "accounts": self.show_accounts_menu,
+                "campaigns": self.show_campaigns_menu,
+                "statistics": lambda event: self.show_statistics(event, event.sender_id),
+                "settings": self.show_settings_menu,
+                "help": self.handle_help,
+                "add_account": self.initiate_account_upload,
+                "create_campaign": self.initiate_campaign_creation,
+                "join_groups": self.initiate_group_join,
+                "mode_groups": lambda event: self.handle_campaign_mode_selection(event, "groups"),
+                "mode_dms": lambda event: self.handle_campaign_mode_selection(event, "dms"),
+                "mode_both": lambda event: self.handle_campaign_mode_selection(event, "both"),
+            }
+            cb_prefix = (
+                ("account_", self.show_account_details),
+                ("campaign_", self.show_campaign_details),
+                ("start_campaign_", self.start_campaign),
+                ("stop_campaign_", self.stop_campaign),
+                ("delete_account_", self.delete_account),
+                ("delete_campaign_", self.delete_campaign),
+                ("start_account_campaign_", self.handle_start_account_campaign),
+                ("stop_account_campaign_", self.handle_stop_account_campaign),
+                ("start_all_campaigns_", self.start_all_campaigns_for_account),
+                ("view_account_campaigns_", self.view_account_campaigns),
+                ("test_account_", self.test_account),
+                ("activate_campaign_", self.activate_campaign),
+                ("deactivate_campaign_", self.deactivate_campaign),
+                ("select_account_for_campaign_", self.select_account_for_campaign),
+            )
+            self._cb_prefix = dict(cb_prefix)
+            # One compiled alternation picks the prefix; longest first so no prefix shadows another
+            self._cb_route = re.compile(
+                '(' + '|'.join(re.escape(prefix) for prefix in sorted(self._cb_prefix, key=len, reverse=True)) + ')(.*)',
+                re.DOTALL
+            )
+            # One pattern for every command, dispatched on the first token
+            self.bot.add_event_handler(self.handle_command, events.NewMessage(pattern=r'^/'))
             self.bot.add_event_handler(self.handle_callback, events.CallbackQuery())
             self.bot.add_event_handler(self.handle_document, events.NewMessage(func=lambda e: e.document))
             self.bot.add_event_handler(self.handle_message, events.NewMessage())
     
     async def init_account_client(self, account: Account) -> bool:
-        """Initialize a client for an account"""
-        if account.name in self.clients:
+        """Initialize a client for an account, reusing its connected client if there is one"""
+        client = self.clients.get(account.name)
+        if client is not None and client.is_connected():
             return True
         
+        # Serialize setup per account so concurrent campaign starts share one client
+        async with self._client_locks[account.name]:
+            client = self.clients.get(account.name)
+            if client is not None:
+                if client.is_connected():
+                    return True
+                try:
+                    await client.connect()
+                    self.drop_cached_dialogs(client)
+                    return True
+                except Exception as e:
+                    logging.warning(f"Reconnecting {account.name} failed, creating a new client: {e}")
+                    self.clients.pop(account.name, None)
+            return await self._create_account_client(account)
+    
+    async def init_account_clients(self, accounts: List[Account]) -> List[Account]:
+        """Initialize clients for several accounts concurrently; returns the ones that connected"""
+        init_limit = asyncio.Semaphore(CLIENT_INIT_CONCURRENCY)
+        
+        async def init_client(account: Account) -> bool:
+            async with init_limit:
+                return await self.init_account_client(account)
+        
+        results = await asyncio.gather(*(init_client(account) for account in accounts), return_exceptions=True)
+        connected = []
+        for account, result in zip(accounts, results):
+            if result is True:
+                connected.append(account)
+            elif isinstance(result, Exception):
+                logging.error(f"Failed to initialize account {account.name}: {result}")
+        return connected
+    
+    async def _create_account_client(self, account: Account) -> bool:
         if not os.path.exists(account.session_file):
             logging.error(f"Session file not found for {account.name}: {account.session_file}")
             return False
@@ -328,11 +1042,12 @@ class TelegramAdBot:
                 api_hash="c045f1239bbf24f22f9e21e38a0c307c"
             )
             await client.connect()
+            self.drop_cached_dialogs(client)
             
             if not await client.is_user_authorized():
                 logging.error(f"Account {account.name} is not authorized")
-                account.status = "error"
-                self.db.save_account(account)
+                self.set_account_status(account, "error")
+                await self.db.save_account(account)
                 return False
             
             # Get account info
@@ -341,150 +1056,231 @@ class TelegramAdBot:
                 try:
                     if hasattr(me, 'phone') and me.phone:
                         account.phone_number = me.phone
-                        self.db.save_account(account)
+                        await self.db.save_account(account)
                 except AttributeError:
                     # Some user types don't have phone attribute
                     pass
             
             self.clients[account.name] = client
-            account.status = "active"
-            self.db.save_account(account)
+            self.set_account_status(account, "active")
+            self.push_active_account(account)
+            await self.db.save_account(account)
             logging.info(f"Account {account.name} initialized successfully")
             return True
         except Exception as e:
             logging.error(f"Failed to initialize account {account.name}: {e}")
-            account.status = "error"
+            self.set_account_status(account, "error")
             account.errors_count += 1
-            self.db.save_account(account)
+            await self.db.save_account(account)
             return False
     
     def get_available_account(self, user_id: int, exclude: Optional[Set[str]] = None) -> Optional[Account]:
         """Get an available account for sending"""
         exclude = exclude or set()
-        
-        available = [
-            acc for acc in self.accounts.values()
-            if acc.status == "active" and acc.name not in exclude
-            and (not acc.flood_wait_until or datetime.now() > acc.flood_wait_until)
-            and acc.user_id == user_id  # Only user's own accounts
-        ]
-        
-        if not available:
+        heap = self._active_heap.get(user_id)
+        if not heap:
             return None
         
-        # Prefer least used account
-        return min(available, key=lambda x: x.messages_sent)
+        now = datetime.now()
+        skipped = []
+        chosen = None
+        
+        # Prefer least used account - the heap top once stale entries are gone
+        while heap:
+            messages_sent, name = heap[0]
+            acc = self.accounts.get(name)
+            if acc is None or acc.user_id != user_id or acc.status != "active":
+                heapq.heappop(heap)
+                continue
+            if acc.messages_sent != messages_sent:
+                # Sends are not pushed; re-key the entry with the current count
+                heapq.heapreplace(heap, (acc.messages_sent, name))
+                continue
+            if name in exclude or (acc.flood_wait_until and now <= acc.flood_wait_until):
+                skipped.append(heapq.heappop(heap))
+                continue
+            chosen = acc
+            break
+        
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return chosen
     
     async def get_targets(self, client: TelegramClient, mode: str, filters: Optional[Dict] = None) -> List[Dict]:
         """Get targets based on mode and filters"""
-        targets = []
+        mode_pred = _MODE_PREDICATES.get(mode)
+        if mode_pred is None:
+            return []
+        
         try:
-            dialogs = await client.get_dialogs()
-            
-            for dialog in dialogs:
-                entity = dialog.entity
-                # Get proper title for the target
-                title = 'Unknown'
-                try:
-                    if hasattr(dialog, 'title') and dialog.title:
-                        title = dialog.title
-                    elif hasattr(entity, 'first_name') and entity.first_name:
-                        title = entity.first_name
-                        if hasattr(entity, 'last_name') and entity.last_name:
-                            title += f" {entity.last_name}"
-                    elif hasattr(entity, 'username') and entity.username:
-                        title = f"@{entity.username}"
-                    elif hasattr(entity, 'phone') and entity.phone:
-                        title = entity.phone
-                except Exception:
-                    title = f"User_{dialog.id}"
-                
-                target_info = {
-                    'id': dialog.id,
-                    'entity': entity,
-                    'title': title
-                }
-                
-                # Filter by mode
-                if mode == 'groups':
-                    if isinstance(entity, (Chat, Channel)) and (not isinstance(entity, Channel) or entity.megagroup):
-                        target_info['type'] = 'group'
-                        targets.append(target_info)
-                elif mode == 'dms':
-                    if isinstance(entity, User) and not entity.bot and not entity.is_self:
-                        target_info['type'] = 'dm'
-                        targets.append(target_info)
-                elif mode == 'both':
-                    if isinstance(entity, (Chat, Channel)) and (not isinstance(entity, Channel) or entity.megagroup):
-                        target_info['type'] = 'group'
-                        targets.append(target_info)
-                    elif isinstance(entity, User) and not entity.bot and not entity.is_self:
-                        target_info['type'] = 'dm'
-                        targets.append(target_info)
-            
-            # Apply filters
-            if filters:
-                targets = self.apply_filters(targets, filters)
-            
-            # Remove blacklisted targets
-            targets = self.remove_blacklisted(targets)
-            
-            # Final validation - remove targets with invalid entities or missing titles
-            validated_targets = []
-            for target in targets:
-                if (target.get('entity') and 
-                    target.get('title') != 'Unknown' and 
-                    target.get('title') is not None and
-                    len(target.get('title', '')) > 0):
-                    validated_targets.append(target)
-                else:
-                    logging.debug(f"Skipping invalid target: {target.get('title', 'Unknown')}")
-            
-            logging.info(f"Found {len(validated_targets)} valid targets (filtered from {len(targets)} total)")
+            dialogs = await self.get_cached_dialogs(client)
+            validated_targets, total = self.build_targets(dialogs, mode_pred, filters)
+            logging.info(f"Found {len(validated_targets)} valid targets (filtered from {total} total)")
             return validated_targets
         except Exception as e:
             logging.error(f"Error getting targets: {e}")
             return []
     
-    def apply_filters(self, targets: List[Dict], filters: Dict) -> List[Dict]:
-        """Apply filters to target list"""
-        filtered = []
-        for target in targets:
-            entity = target['entity']
+    async def iter_targets(self, client: TelegramClient, mode: str, filters: Optional[Dict] = None):
+        """Yield targets page by page so sending can start before all dialogs are fetched"""
+        mode_pred = _MODE_PREDICATES.get(mode)
+        if mode_pred is None:
+            return
+        
+        found = 0
+        total = 0
+        try:
+            async for page in self.iter_dialog_pages(client):
+                page_targets, page_total = self.build_targets(page, mode_pred, filters)
+                found += len(page_targets)
+                total += page_total
+                for target in page_targets:
+                    yield target
+        except Exception as e:
+            logging.error(f"Error getting targets: {e}")
+            return
+        
+        logging.info(f"Found {found} valid targets (filtered from {total} total)")
+    
+    def build_targets(self, dialogs: List, mode_pred: Callable, filters: Optional[Dict]) -> Tuple[List[Dict], int]:
+        """Turn dialogs into validated targets; also returns how many passed the filters"""
+        # Candidate targets are kept as parallel lists plus a keep flag per index
+        ids: List[int] = []
+        entities: List = []
+        titles: List[str] = []
+        types: List[str] = []
+        blacklisted_ids = self.db.blacklist
+        
+        for dialog in dialogs:
+            # Cheap rejects first: blacklist, then mode - both before any title work
+            if blacklisted_ids and str(dialog.id) in blacklisted_ids:
+                continue
+            
+            entity = dialog.entity
+            target_type = mode_pred(entity)
+            if target_type is None:
+                continue
+            
+            # Get proper title for the target
+            try:
+                title = getattr(dialog, 'title', None)
+                if not title:
+                    first_name = getattr(entity, 'first_name', None)
+                    if first_name:
+                        last_name = getattr(entity, 'last_name', None)
+                        title = f"{first_name} {last_name}" if last_name else first_name
+                    else:
+                        username = getattr(entity, 'username', None)
+                        title = f"@{username}" if username else (getattr(entity, 'phone', None) or 'Unknown')
+            except Exception:
+                title = f"User_{dialog.id}"
+            
+            ids.append(dialog.id)
+            entities.append(entity)
+            titles.append(title)
+            types.append(target_type)
+        
+        keep = [True] * len(ids)
+        
+        # Apply filters
+        if filters:
+            self.apply_filters(entities, titles, keep, filters)
+        
+        # Final validation - remove targets with invalid entities or missing titles
+        validated_targets = []
+        total = 0
+        for i, kept in enumerate(keep):
+            if not kept:
+                continue
+            total += 1
+            title = titles[i]
+            if entities[i] and title and title != 'Unknown':
+                validated_targets.append({
+                    'id': ids[i],
+                    'entity': entities[i],
+                    'title': title,
+                    'type': types[i]
+                })
+            else:
+                logging.debug(f"Skipping invalid target: {title or 'Unknown'}")
+        
+        return validated_targets, total
+    
+    async def get_cached_dialogs(self, client: TelegramClient) -> List:
+        """Fetch a client's dialogs, reusing a recent result for the same session"""
+        dialogs = self._cached_dialogs(client)
+        if dialogs is None:
+            dialogs = await client.get_dialogs()
+            self._store_dialogs(client, dialogs)
+        return dialogs
+    
+    async def iter_dialog_pages(self, client: TelegramClient):
+        """Yield a client's dialogs in TARGET_PAGE_SIZE pages, fetching lazily on a cache miss"""
+        dialogs = self._cached_dialogs(client)
+        if dialogs is not None:
+            for start in range(0, len(dialogs), TARGET_PAGE_SIZE):
+                yield dialogs[start:start + TARGET_PAGE_SIZE]
+            return
+        
+        # The full list is cached only once the iteration completes
+        dialogs = []
+        page = []
+        async for dialog in client.iter_dialogs():
+            page.append(dialog)
+            if len(page) == TARGET_PAGE_SIZE:
+                dialogs.extend(page)
+                yield page
+                page = []
+        if page:
+            dialogs.extend(page)
+            yield page
+        self._store_dialogs(client, dialogs)
+    
+    def _cached_dialogs(self, client: TelegramClient) -> Optional[List]:
+        cached = self._dialog_cache.get(getattr(client.session, 'filename', None))
+        if cached and time.monotonic() - cached[0] < DIALOG_CACHE_TTL:
+            return cached[1]
+        return None
+    
+    def _store_dialogs(self, client: TelegramClient, dialogs: List):
+        cache_key = getattr(client.session, 'filename', None)
+        if cache_key:
+            self._dialog_cache[cache_key] = (time.monotonic(), dialogs)
+    
+    def drop_cached_dialogs(self, client: TelegramClient):
+        """Forget a session's cached dialogs; a new connection may see a different list"""
+        self._dialog_cache.pop(getattr(client.session, 'filename', None), None)
+    
+    def apply_filters(self, entities: List, titles: List[str], keep: List[bool], filters: Dict):
+        """Clear the keep flag of targets rejected by the filters"""
+        include = _keyword_matcher(filters['keywords']) if 'keywords' in filters else None
+        exclude = _keyword_matcher(filters['exclude_keywords']) if 'exclude_keywords' in filters else None
+        
+        for i, entity in enumerate(entities):
+            if not keep[i]:
+                continue
             
             # Member count filter for groups
-            if 'min_members' in filters and hasattr(entity, 'participants_count'):
-                if entity.participants_count < filters['min_members']:
+            participants_count = getattr(entity, 'participants_count', None)
+            if participants_count is not None:
+                if 'min_members' in filters and participants_count < filters['min_members']:
+                    keep[i] = False
                     continue
-            
-            if 'max_members' in filters and hasattr(entity, 'participants_count'):
-                if entity.participants_count > filters['max_members']:
+                
+                if 'max_members' in filters and participants_count > filters['max_members']:
+                    keep[i] = False
                     continue
             
             # Keyword filters
-            if 'keywords' in filters:
-                title = target['title'].lower()
-                if not any(keyword.lower() in title for keyword in filters['keywords']):
+            if include or exclude:
+                title = titles[i].lower()
+                if include and not include(title):
+                    keep[i] = False
                     continue
-            
-            if 'exclude_keywords' in filters:
-                title = target['title'].lower()
-                if any(keyword.lower() in title for keyword in filters['exclude_keywords']):
+                
+                if exclude and exclude(title):
+                    keep[i] = False
                     continue
-            
-            filtered.append(target)
-        
-        return filtered
-    
-    def remove_blacklisted(self, targets: List[Dict]) -> List[Dict]:
-        """Remove blacklisted targets"""
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT target_id FROM blacklist')
-        blacklisted_ids = {row[0] for row in cursor.fetchall()}
-        conn.close()
-        
-        return [t for t in targets if str(t['id']) not in blacklisted_ids]
     
     async def send_message_to_target(self, client: TelegramClient, target: Dict, message: str) -> bool:
         """Send message to a target"""
@@ -521,10 +1317,10 @@ class TelegramAdBot:
             logging.info(f"User {target_title} account deleted - skipping")
             return False
         except Exception as e:
-            error_msg = str(e).lower()
-            if 'deleted' in error_msg or 'deactivated' in error_msg:
+            kind = _classify_error(e)
+            if kind == 'deleted':
                 logging.info(f"User {target_title} account deleted - skipping")
-            elif 'flood' in error_msg:
+            elif kind == 'flood':
                 logging.warning(f"🚫 Rate limited for target {target_title} - will pause")
             else:
                 logging.error(f"Error sending to {target_title}: {e}")
@@ -551,11 +1347,11 @@ class TelegramAdBot:
                 logging.error(f"No accounts available for campaign {campaign.name}")
                 return
             
-            # Initialize clients for campaign accounts
-            available_clients = {}
-            for account in campaign_accounts:
-                if await self.init_account_client(account):
-                    available_clients[account.name] = self.clients[account.name]
+            # Initialize clients for campaign accounts concurrently
+            available_clients = {
+                account.name: self.clients[account.name]
+                for account in await self.init_account_clients(campaign_accounts)
+            }
             
             if not available_clients:
                 logging.error(f"No clients available for campaign {campaign.name}")
@@ -572,90 +1368,87 @@ class TelegramAdBot:
             # Shuffle targets for better distribution
             random.shuffle(targets)
             
+            # Every account drains the same queue at its own pace
+            queue: asyncio.Queue = asyncio.Queue()
+            for target in targets:
+                queue.put_nowait(target)
+            
             sent_count = 0
             failed_count = 0
-            account_rotation = 0
+            messages = _message_stream(campaign.messages)
             
-            for target in targets:
-                if campaign_id not in self.running_campaigns:
-                    break
-                
-                # Rotate through available accounts
-                account_names_list = list(available_clients.keys())
-                if not account_names_list:
-                    break
-                
-                current_account_name = account_names_list[account_rotation % len(account_names_list)]
-                current_client = available_clients[current_account_name]
-                current_account = self.accounts[current_account_name]
+            async def send_worker(current_account: Account, current_client: TelegramClient):
+                nonlocal sent_count, failed_count
+                current_account_name = current_account.name
                 
-                # Check if account is still available
-                if current_account.status != "active":
-                    # Remove from available clients
-                    available_clients.pop(current_account_name, None)
-                    if not available_clients:
+                # Stop when the campaign is stopped or the account is no longer available
+                while campaign_id in self.running_campaigns and current_account.status == "active":
+                    try:
+                        target = queue.get_nowait()
+                    except asyncio.QueueEmpty:
                         break
-                    continue
-                
-                # Select message
-                message = random.choice(campaign.messages) if campaign.messages else "Hello!"
-                
-                try:
-                    success = await self.send_message_to_target(current_client, target, message)
                     
-                    if success:
-                        sent_count += 1
-                        current_account.messages_sent += 1
-                        current_account.last_used = datetime.now()
-                        self.stats['total_sent'] += 1
-                    else:
-                        failed_count += 1
-                        self.stats['total_failed'] += 1
+                    # Select message
+                    message = next(messages)
                     
-                    # Log activity
-                    self.db.log_activity(
-                        current_account_name, campaign_id, target['id'], 
-                        target['type'], success
-                    )
-                    
-                    # Save account stats
-                    self.db.save_account(current_account)
-                    
-                except errors.FloodWaitError as e:
-                    if e.seconds > FLOOD_WAIT_TOLERANCE:
-                        # Mark account as flood waited
-                        current_account.status = "flood_wait"
-                        current_account.flood_wait_until = datetime.now() + timedelta(seconds=e.seconds)
-                        self.db.save_account(current_account)
-                        available_clients.pop(current_account_name, None)
+                    try:
+                        success = await self.send_message_to_target(current_client, target, message)
+                        # One timestamp per send serves both the account and the log row
+                        now = datetime.now()
                         
-                        # Log flood wait
-                        self.db.log_activity(
-                            current_account_name, campaign_id, target['id'], 
-                            target['type'], False, f"Flood wait: {e.seconds}s"
-                        )
-                    else:
-                        await asyncio.sleep(e.seconds)
-                        continue
-                
-                except Exception as e:
-                    failed_count += 1
-                    current_account.errors_count += 1
-                    self.stats['total_failed'] += 1
+                        if success:
+                            sent_count += 1
+                            current_account.messages_sent += 1
+                            current_account.last_used = now
+                            self.stats['total_sent'] += 1
+                            self.count_account_send(current_account)
+                        else:
+                            failed_count += 1
+                            self.stats['total_failed'] += 1
+                        
+                        # Log activity
+                        self.record_activity(current_account_name, campaign_id, target, success, timestamp=now)
+                        
+                    except errors.FloodWaitError as e:
+                        if e.seconds > FLOOD_WAIT_TOLERANCE:
+                            now = datetime.now()
+                            # Mark account as flood waited - status changes are saved right away
+                            self.set_account_status(current_account, "flood_wait")
+                            current_account.flood_wait_until = now + timedelta(seconds=e.seconds)
+                            await self.db.save_account(current_account)
+                            
+                            # Log flood wait
+                            self.record_activity(
+                                current_account_name, campaign_id, target, False,
+                                f"Flood wait: {e.seconds}s", now
+                            )
+                            break
+                        else:
+                            # Retry the target once this account's short wait is over
+                            await asyncio.sleep(e.seconds)
+                            queue.put_nowait(target)
+                            continue
                     
-                    # Log error
-                    self.db.log_activity(
-                        current_account_name, campaign_id, target['id'], 
-                        target['type'], False, str(e)
-                    )
+                    except Exception as e:
+                        failed_count += 1
+                        current_account.errors_count += 1
+                        self.stats['total_failed'] += 1
+                        self.queue_account_save(current_account)
+                        
+                        # Log error
+                        self.record_activity(current_account_name, campaign_id, target, False, str(e))
                     
-                    self.db.save_account(current_account)
-                
-                # Rotate to next account
-                account_rotation += 1
-                
-                # Wait between messages
-                await asyncio.sleep(campaign.interval)
+                    # Wait between messages on this account
+                    await asyncio.sleep(campaign.interval)
+            
+            worker_accounts = [account for account in campaign_accounts if account.name in available_clients]
+            results = await asyncio.gather(
+                *(send_worker(account, available_clients[account.name]) for account in worker_accounts),
+                return_exceptions=True
+            )
+            for account, result in zip(worker_accounts, results):
+                if isinstance(result, Exception):
+                    logging.error(f"Campaign {campaign.name} worker for {account.name} failed: {result}")
             
             logging.info(f"Campaign {campaign.name} completed: {sent_count} sent, {failed_count} failed")
             
@@ -679,8 +1472,8 @@ class TelegramAdBot:
             [Button.inline("Statistics", b"statistics"), Button.inline("Settings", b"settings")]
         ]
         
-        active_user_accounts = [a for a in user_accounts if a.status == 'active']
-        active_user_campaigns = [c for c in user_campaigns if c.active]
+        active_user_accounts = self.get_user_active_accounts(event.sender_id)
+        active_user_campaigns = self.get_user_active_campaigns(event.sender_id)
         
         welcome_msg = f"""
 **Welcome to Telegram Marketing Bot!**
@@ -703,7 +1496,13 @@ Uptime: {str(datetime.now() - self.stats['uptime_start']).split('.')[0]}
 {"Ready to start marketing!" if user_accounts and user_campaigns else "Get started by adding accounts and creating campaigns!"}
         """
         
-        await event.reply(welcome_msg, buttons=buttons)
+        await self.reply(event, welcome_msg, buttons=buttons)
+    
+    async def handle_command(self, event):
+        parts = event.raw_text.split(None, 1)
+        # Strip the bot mention from commands like /start@BotName
+        cmd = parts[0].split('@', 1)[0] if parts else ''
+        await self._cmd_table.get(cmd, self.handle_message)(event)
     
     async def handle_help(self, event):
         self.add_user_to_authorized(event.sender_id)
@@ -765,7 +1564,7 @@ Uptime: {str(datetime.now() - self.stats['uptime_start']).split('.')[0]}
 Each menu has clear instructions - just follow the buttons!
         """
         
-        await event.reply(help_text)
+        await self.reply(event, help_text)
     
     async def handle_accounts(self, event):
         self.add_user_to_authorized(event.sender_id)
@@ -801,7 +1600,7 @@ Each menu has clear instructions - just follow the buttons!
             
             if not file_path.endswith('.session'):
                 os.remove(file_path)
-                await event.reply("Invalid file. Please upload a .session file.")
+                await self.reply(event, "Invalid file. Please upload a .session file.")
                 return
             
             # Generate account name
@@ -812,21 +1611,21 @@ Each menu has clear instructions - just follow the buttons!
             
             # Test the account
             if await self.init_account_client(account):
-                self.accounts[account_name] = account
-                self.db.save_account(account)
+                self.add_account(account)
+                await self.db.save_account(account)
                 
-                await event.reply(f"Account **{account_name}** added successfully!\n"
+                await self.reply(event, f"Account **{account_name}** added successfully!\n"
                                 f"Phone: {account.phone_number or 'Unknown'}")
             else:
                 os.remove(file_path)
-                await event.reply("Failed to initialize account. Please check the session file.")
+                await self.reply(event, "Failed to initialize account. Please check the session file.")
             
             # Clear state
             self.user_state.pop(event.sender_id, None)
             
         except Exception as e:
             logging.error(f"Session upload error: {e}")
-            await event.reply(f"Error processing session file: {str(e)}")
+            await self.reply(event, f"Error processing session file: {str(e)}")
     
     async def handle_message(self, event):
         if event.sender_id not in self.authorized_users or event.text.startswith('/'):
@@ -848,74 +1647,16 @@ Each menu has clear instructions - just follow the buttons!
     
     async def handle_callback(self, event):
         data = event.data.decode('utf-8')
+        query_id = event.id
         
         try:
-            if data == "dashboard":
-                await self.show_dashboard(event)
-            elif data == "accounts":
-                await self.show_accounts_menu(event)
-            elif data == "campaigns":
-                await self.show_campaigns_menu(event)
-            elif data == "statistics":
-                await self.show_statistics(event, event.sender_id)
-            elif data == "settings":
-                await self.show_settings_menu(event)
-            elif data == "help":
-                await self.handle_help(event)
-            elif data == "add_account":
-                await self.initiate_account_upload(event)
-            elif data == "create_campaign":
-                await self.initiate_campaign_creation(event)
-            elif data.startswith("account_"):
-                await self.show_account_details(event, data.split("_", 1)[1])
-            elif data.startswith("campaign_"):
-                await self.show_campaign_details(event, data.split("_", 1)[1])
-            elif data.startswith("start_campaign_"):
-                campaign_id = data.split("_", 2)[2]
-                await self.start_campaign(event, campaign_id)
-            elif data.startswith("stop_campaign_"):
-                campaign_id = data.split("_", 2)[2]
-                await self.stop_campaign(event, campaign_id)
-            elif data.startswith("delete_account_"):
-                account_name = data.split("_", 2)[2]
-                await self.delete_account(event, account_name)
-            elif data.startswith("delete_campaign_"):
-                campaign_id = data.split("_", 2)[2]
-                await self.delete_campaign(event, campaign_id)
-            elif data.startswith("start_account_campaign_"):
-                parts = data.split("_", 3)
-                account_name, campaign_id = parts[2], parts[3]
-                await self.start_account_campaign(event, account_name, campaign_id)
-            elif data.startswith("stop_account_campaign_"):
-                parts = data.split("_", 3) 
-                account_name, campaign_id = parts[2], parts[3]
-                await self.stop_account_campaign(event, account_name, campaign_id)
-            elif data.startswith("start_all_campaigns_"):
-                account_name = data.split("_", 3)[3]
-                await self.start_all_campaigns_for_account(event, account_name)
-            elif data.startswith("view_account_campaigns_"):
-                account_name = data.split("_", 3)[3]
-                await self.view_account_campaigns(event, account_name)
-            elif data.startswith("test_account_"):
-                account_name = data.split("_", 2)[2]
-                await self.test_account(event, account_name)
-            elif data.startswith("activate_campaign_"):
-                campaign_id = data.split("_", 2)[2]
-                await self.activate_campaign(event, campaign_id)
-            elif data.startswith("deactivate_campaign_"):
-                campaign_id = data.split("_", 2)[2]
-                await self.deactivate_campaign(event, campaign_id)
-            elif data.startswith("select_account_for_campaign_"):
-                campaign_id = data.split("_", 4)[4]
-                await self.select_account_for_campaign(event, campaign_id)
-            elif data == "join_groups":
-                await self.initiate_group_join(event)
-            elif data == "mode_groups":
-                await self.handle_campaign_mode_selection(event, "groups")
-            elif data == "mode_dms":
-                await self.handle_campaign_mode_selection(event, "dms")  
-            elif data == "mode_both":
-                await self.handle_campaign_mode_selection(event, "both")
+            handler = self._cb_exact.get(data)
+            if handler:
+                await handler(event)
+                return
+            match = self._cb_route.match(data)
+            if match:
+                await self._cb_prefix[match.group(1)](event, match.group(2))
         except Exception as e:
             error_msg = str(e)
             if "not modified" in error_msg.lower():
@@ -924,31 +1665,97 @@ Each menu has clear instructions - just follow the buttons!
                 return
             else:
                 logging.error(f"Callback handler error: {e}")
+                if query_id in self._answered_queries:
+                    # A query takes only one answer; the handler already used it
+                    return
                 try:
-                    await event.answer("An error occurred. Please try again.", alert=True)
+                    await self.answer(event, "An error occurred. Please try again.", alert=True)
                 except Exception:
                     # If we can't send the error message, just log it
                     logging.error(f"Failed to send error message to user: {e}")
+        finally:
+            # Every query is answered exactly once; acknowledge it if the handler did not
+            if query_id not in self._answered_queries:
+                try:
+                    await self.answer(event)
+                except errors.RPCError as e:
+                    logging.debug(f"Could not acknowledge callback query: {e}")
+            self._answered_queries.discard(query_id)
+    
+    def split_account_campaign(self, data: str) -> Tuple[str, str]:
+        """Split '<account>_<campaign_id>' callback data; both parts may contain underscores"""
+        sep = data.find("_")
+        while sep != -1:
+            if data[:sep] in self.accounts and data[sep + 1:] in self.campaigns:
+                return data[:sep], data[sep + 1:]
+            sep = data.find("_", sep + 1)
+        return data.partition("_")[::2]
+    
+    async def handle_start_account_campaign(self, event, data: str):
+        account_name, campaign_id = self.split_account_campaign(data)
+        await self.start_account_campaign(event, account_name, campaign_id)
+    
+    async def handle_stop_account_campaign(self, event, data: str):
+        account_name, campaign_id = self.split_account_campaign(data)
+        await self.stop_account_campaign(event, account_name, campaign_id)
     
     # UI Methods
-    async def show_dashboard(self, event):
-        active_accounts = len([a for a in self.accounts.values() if a.status == 'active'])
-        active_campaigns = len([c for c in self.campaigns.values() if c.active])
-        
-        # Get recent stats
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
+    # Every outgoing bot request takes a token from self._rate first
+    async def answer(self, event, *args, **kwargs):
+        """Answer a callback query within the bot's request rate"""
+        # Recorded before any await: toasts gathered with a menu refresh (which never
+        # answers) must already count as the query's answer when handle_callback finishes
+        if isinstance(event, events.CallbackQuery.Event):
+            self._answered_queries.add(event.id)
+        await self._rate.acquire()
+        return await event.answer(*args, **kwargs)
+    
+    async def reply(self, event, *args, **kwargs):
+        """Reply to a message within the bot's request rate"""
+        await self._rate.acquire()
+        return await event.reply(*args, **kwargs)
+    
+    async def edit(self, message, *args, **kwargs):
+        """Edit a message (or a callback query's message) within the bot's request rate"""
+        await self._rate.acquire()
+        return await message.edit(*args, **kwargs)
+    
+    async def edit_menu(self, event, text: str, buttons=None):
+        """Edit a menu message, skipping the request when it already shows this content.
+        
+        Never answers the callback query; handle_callback acknowledges unanswered queries.
+        """
+        if not isinstance(event, events.CallbackQuery.Event):
+            await self.edit(event, text, buttons=buttons)
+            return
         
-        # Messages sent today
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT COUNT(*) FROM statistics WHERE DATE(timestamp) = ? AND message_sent = 1', (today,))
-        messages_today = cursor.fetchone()[0]
+        key = (event.chat_id, event.message_id)
+        render = hash((text, tuple(tuple((b.text, b.data) for b in row) for row in buttons or ())))
+        if self._last_render.get(key) == render:
+            return
         
-        # Total messages
-        cursor.execute('SELECT COUNT(*) FROM statistics WHERE message_sent = 1')
-        total_messages = cursor.fetchone()[0]
+        await self.edit(event, text, buttons=buttons)
+        self._last_render.pop(key, None)
+        if len(self._last_render) >= RENDER_CACHE_SIZE:
+            del self._last_render[next(iter(self._last_render))]
+        self._last_render[key] = render
+    
+    async def show_dashboard(self, event):
+        active_accounts = len(self.active_accounts)
+        active_campaigns = len(self.active_campaigns)
         
-        conn.close()
+        # Get recent stats
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        tick = time.monotonic()
+        cached = self._dashboard_cache
+        if cached and tick - cached[0] < STATS_CACHE_TTL:
+            _, messages_today, total_messages = cached
+        else:
+            messages_today, total_messages = await self.single_flight(
+                ("dashboard",), lambda: self.db.get_dashboard_counts(today)
+            )
+            self._dashboard_cache = (tick, messages_today, total_messages)
         
         dashboard_text = f"""
 **System Dashboard**
@@ -961,80 +1768,72 @@ Running: {len(self.running_campaigns)} campaigns
 **Statistics**
 Today: {messages_today} messages
 Total: {total_messages} messages
-Uptime: {datetime.now() - self.stats['uptime_start']}
+Uptime: {now - self.stats['uptime_start']}
         """
         
-        buttons = [
-            [Button.inline("Manage Accounts", b"accounts"), Button.inline("Campaigns", b"campaigns")],
-            [Button.inline("Statistics", b"statistics"), Button.inline("Settings", b"settings")],
-            [Button.inline("Refresh Dashboard", b"dashboard")]
-        ]
-        
-        await event.edit(dashboard_text, buttons=buttons)
+        await self.edit_menu(event, dashboard_text, self._dashboard_buttons)
     
     async def show_accounts_menu(self, event):
         user_id = event.sender_id
         
-        # Get ALL accounts first, then filter properly
-        all_accounts = list(self.accounts.values())
-        user_accounts = [acc for acc in all_accounts if acc.user_id == user_id or acc.user_id is None]
-        
-        # For accounts with None user_id, assign them to the current user if under limit
-        unassigned_accounts = [acc for acc in user_accounts if acc.user_id is None]
-        current_user_accounts = [acc for acc in user_accounts if acc.user_id == user_id]
+        # Accounts with None user_id are assigned to the current user if under limit
+        unassigned_accounts = self.get_user_accounts(None)
+        current_user_accounts = self.get_user_accounts(user_id)
         
         # Assign unassigned accounts to user if under limit
         if unassigned_accounts and len(current_user_accounts) < 2:
             for acc in unassigned_accounts[:2-len(current_user_accounts)]:
-                acc.user_id = user_id
-                self.db.save_account(acc)
+                self.set_account_owner(acc, user_id)
+                await self.db.save_account(acc)
                 current_user_accounts.append(acc)
         
         user_accounts = current_user_accounts
         
-        accounts_text = "**📱 Your Telegram Accounts**\n\nManage unlimited accounts for your marketing campaigns!\n\n"
+        text_parts = ["**📱 Your Telegram Accounts**\n\nManage unlimited accounts for your marketing campaigns!\n\n"]
         buttons = []
         
         if not user_accounts:
-            accounts_text += "No accounts found.\n\n"
+            text_parts.append("No accounts found.\n\n")
         else:
+            now = datetime.now()
+            # Local aliases for the per-account loop
+            append_text = text_parts.append
+            append_button = buttons.append
+            inline = Button.inline
+            status_labels = STATUS_DISPLAY
             for account in user_accounts:
-                status_display = {
-                    'active': 'ACTIVE',
-                    'flood_wait': 'FLOOD_WAIT', 
-                    'banned': 'BANNED',
-                    'error': 'ERROR'
-                }.get(account.status, 'UNKNOWN')
+                name = account.name
+                status_display = status_labels.get(account.status, 'UNKNOWN')
                 
-                accounts_text += f"**{account.name}** [{status_display}]\n"
-                accounts_text += f"Phone: {account.phone_number or 'Unknown'}\n"
-                accounts_text += f"Messages sent: {account.messages_sent}\n"
+                append_text(
+                    f"**{name}** [{status_display}]\n"
+                    f"Phone: {account.phone_number or 'Unknown'}\n"
+                    f"Messages sent: {account.messages_sent}\n"
+                )
                 
                 if account.flood_wait_until:
-                    wait_time = account.flood_wait_until - datetime.now()
-                    if wait_time.total_seconds() > 0:
-                        accounts_text += f"Flood wait: {int(wait_time.total_seconds()//60)} minutes\n"
+                    wait_seconds = (account.flood_wait_until - now).total_seconds()
+                    if wait_seconds > 0:
+                        append_text(f"Flood wait: {int(wait_seconds // 60)} minutes\n")
                 
-                accounts_text += "\n"
+                append_text("\n")
                 
-                buttons.append([Button.inline(f"{account.name} [{status_display}]", f"account_{account.name}")])
+                append_button([inline(f"{name} [{status_display}]", f"account_{name}")])
         
         # Account management buttons
-        buttons.append([Button.inline("➕ Add New Account", b"add_account")])
-        buttons.append([Button.inline("🔗 Join Groups", b"join_groups")])
-        buttons.append([Button.inline("Back to Dashboard", b"dashboard")])
+        buttons.extend(self._accounts_footer)
         
-        await event.edit(accounts_text, buttons=buttons)
+        await self.edit_menu(event, "".join(text_parts), buttons)
     
     async def show_campaigns_menu(self, event):
         user_id = event.sender_id
         user_campaigns = self.get_user_campaigns(user_id)
         
-        campaigns_text = "**🎯 Your Marketing Campaigns**\n\nCreate and manage powerful advertising campaigns!\n\n"
+        text_parts = ["**🎯 Your Marketing Campaigns**\n\nCreate and manage powerful advertising campaigns!\n\n"]
         buttons = []
         
         if not user_campaigns:
-            campaigns_text += "No campaigns configured.\n\n"
+            text_parts.append("No campaigns configured.\n\n")
         else:
             for campaign in user_campaigns:
                 campaign_id = campaign.id
@@ -1042,8 +1841,10 @@ Uptime: {datetime.now() - self.stats['uptime_start']}
                 status = "ACTIVE" if campaign.active else "INACTIVE"
                 running_status = " [RUNNING]" if campaign_id in self.running_campaigns else ""
                 
-                campaigns_text += f"{status_icon} **{campaign.name}** [{status}]{running_status}\n"
-                campaigns_text += f"Mode: {campaign.mode} | Messages: {len(campaign.messages)} | Interval: {campaign.interval}s\n\n"
+                text_parts.append(
+                    f"{status_icon} **{campaign.name}** [{status}]{running_status}\n"
+                    f"Mode: {campaign.mode} | Messages: {len(campaign.messages)} | Interval: {campaign.interval}s\n\n"
+                )
                 
                 button_text = f"{status_icon} {campaign.name}"
                 if not campaign.active:
@@ -1055,10 +1856,9 @@ Uptime: {datetime.now() - self.stats['uptime_start']}
                 
                 buttons.append([Button.inline(button_text, f"campaign_{campaign_id}")])
         
-        buttons.append([Button.inline("➕ Create New Campaign", b"create_campaign")])
-        buttons.append([Button.inline("⬅️ Back to Dashboard", b"dashboard")])
+        buttons.extend(self._campaigns_footer)
         
-        await event.edit(campaigns_text, buttons=buttons)
+        await self.edit_menu(event, "".join(text_parts), buttons)
     
     async def show_statistics(self, event, user_id: Optional[int] = None):
         if user_id is None:
@@ -1066,7 +1866,7 @@ Uptime: {datetime.now() - self.stats['uptime_start']}
         
         # Ensure user_id is valid
         if user_id is None:
-            await event.reply("Unable to identify user.")
+            await self.reply(event, "Unable to identify user.")
             return
             
         user_accounts = self.get_user_accounts(user_id)
@@ -1075,43 +1875,25 @@ Uptime: {datetime.now() - self.stats['uptime_start']}
         if not user_account_names:
             stats_text = "📈 **Your Statistics**\n\nNo accounts configured yet. Add accounts to see statistics."
             buttons = [[Button.inline("🔙 Back", b"dashboard")]]
-            await event.edit(stats_text, buttons=buttons)
+            await self.edit_menu(event, stats_text, buttons)
             return
         
-        conn = sqlite3.connect(self.db.db_path)
-        account_names_placeholder = ','.join('?' for _ in user_account_names)
-        cursor = conn.cursor()
-        
-        # User's overall stats
-        cursor.execute(f'SELECT COUNT(*) FROM statistics WHERE message_sent = 1 AND account_name IN ({account_names_placeholder})', user_account_names)
-        total_sent = cursor.fetchone()[0]
-        
-        cursor.execute(f'SELECT COUNT(*) FROM statistics WHERE message_sent = 0 AND account_name IN ({account_names_placeholder})', user_account_names)
-        total_failed = cursor.fetchone()[0]
-        
-        # User's today stats
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute(f'SELECT COUNT(*) FROM statistics WHERE DATE(timestamp) = ? AND message_sent = 1 AND account_name IN ({account_names_placeholder})', [today] + user_account_names)
-        today_sent = cursor.fetchone()[0]
-        
-        # User's account performance
-        cursor.execute(f'''
-            SELECT account_name, 
-                   SUM(CASE WHEN message_sent = 1 THEN 1 ELSE 0 END) as sent,
-                   SUM(CASE WHEN message_sent = 0 THEN 1 ELSE 0 END) as failed
-            FROM statistics 
-            WHERE account_name IN ({account_names_placeholder})
-            GROUP BY account_name
-            ORDER BY sent DESC
-            LIMIT 5
-        ''', user_account_names)
-        account_stats = cursor.fetchall()
-        
-        conn.close()
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        tick = time.monotonic()
+        cached = self._stats_cache.get(user_id)
+        if cached and tick - cached[0] < STATS_CACHE_TTL:
+            user_stats = cached[1]
+        else:
+            user_stats = await self.single_flight(
+                ("statistics", user_id), lambda: self.db.get_user_stats(user_account_names, today)
+            )
+            self._stats_cache[user_id] = (tick, user_stats)
+        total_sent, total_failed, today_sent, account_stats = user_stats
         
         success_rate = (total_sent / (total_sent + total_failed) * 100) if (total_sent + total_failed) > 0 else 0
         
-        stats_text = f"""
+        text_parts = [f"""
 **Your Statistics**
 
 **Overall Performance**
@@ -1121,20 +1903,21 @@ Success Rate: {success_rate:.1f}%
 Today: {today_sent} messages
 
 **Account Performance**
-"""
+"""]
         
         for account_name, sent, failed in account_stats:
             rate = (sent / (sent + failed) * 100) if (sent + failed) > 0 else 0
-            stats_text += f"- {account_name}: {sent} sent, {failed} failed ({rate:.1f}%)\n"
+            text_parts.append(f"- {account_name}: {sent} sent, {failed} failed ({rate:.1f}%)\n")
         
-        stats_text += f"\n**System Info**\nUptime: {datetime.now() - self.stats['uptime_start']}"
+        text_parts.append(f"\n**System Info**\nUptime: {now - self.stats['uptime_start']}")
+        stats_text = "".join(text_parts)
         
         buttons = [
             [Button.inline("Refresh", b"statistics")],
             [Button.inline("Back", b"dashboard")]
         ]
         
-        await event.edit(stats_text, buttons=buttons)
+        await self.edit_menu(event, stats_text, buttons)
     
     async def show_settings_menu(self, event):
         settings_text = """
@@ -1148,14 +1931,7 @@ Default Interval: 5 seconds
 **Available Actions**
         """
         
-        buttons = [
-            [Button.inline("Clear Statistics", b"clear_stats")],
-            [Button.inline("Export Data", b"export_data")],
-            [Button.inline("Manage Blacklist", b"blacklist")],
-            [Button.inline("Back", b"dashboard")]
-        ]
-        
-        await event.edit(settings_text, buttons=buttons)
+        await self.edit_menu(event, settings_text, self._settings_buttons)
     
     async def initiate_account_upload(self, event):
         self.user_state[event.sender_id] = {'action': 'upload_session'}
@@ -1174,18 +1950,19 @@ Please upload your Telegram session file (.session).
         """
         
         buttons = [[Button.inline("Cancel", b"accounts")]]
-        await event.edit(instructions, buttons=buttons)
+        await self.edit_menu(event, instructions, buttons)
     
     async def initiate_campaign_creation(self, event):
         if not self.accounts:
-            await event.answer("Add accounts first before creating campaigns!", alert=True)
+            await self.answer(event, "Add accounts first before creating campaigns!", alert=True)
             return
         
         self.user_state[event.sender_id] = {'action': 'campaign_name', 'campaign_data': {}}
         
-        await event.edit(
+        await self.edit_menu(
+            event,
             "**Create Campaign**\n\nStep 1: Enter campaign name:",
-            buttons=[[Button.inline("Cancel", b"campaigns")]]
+            [[Button.inline("Cancel", b"campaigns")]]
         )
     
     async def handle_campaign_name_input(self, event):
@@ -1193,7 +1970,7 @@ Please upload your Telegram session file (.session).
         campaign_name = event.raw_text.strip()
         
         if len(campaign_name) < 3:
-            await event.reply("Campaign name must be at least 3 characters long.")
+            await self.reply(event, "Campaign name must be at least 3 characters long.")
             return
         
         campaign_id = f"campaign_{int(time.time())}"
@@ -1209,7 +1986,7 @@ Please upload your Telegram session file (.session).
         
         user_state['action'] = 'campaign_messages'
         
-        await event.reply(
+        await self.reply(event, 
             f"Campaign name: **{campaign_name}**\n\n"
             "Step 2: Enter your messages (one per line, or type 'done' when finished):"
         )
@@ -1220,7 +1997,7 @@ Please upload your Telegram session file (.session).
         
         if message_text.lower() == 'done':
             if not user_state['campaign_data']['messages']:
-                await event.reply("Add at least one message before continuing.")
+                await self.reply(event, "Add at least one message before continuing.")
                 return
             
             # Show campaign mode selection
@@ -1231,7 +2008,7 @@ Please upload your Telegram session file (.session).
             ]
             
             messages_count = len(user_state['campaign_data']['messages'])
-            await event.reply(
+            await self.reply(event, 
                 f"Added {messages_count} message(s)\n\n"
                 "Step 3: Select target mode:",
                 buttons=buttons
@@ -1240,46 +2017,46 @@ Please upload your Telegram session file (.session).
             return
         
         user_state['campaign_data']['messages'].append(message_text)
-        await event.reply(f"Message {len(user_state['campaign_data']['messages'])} added. Send another message or type 'done':")
+        await self.reply(event, f"Message {len(user_state['campaign_data']['messages'])} added. Send another message or type 'done':")
     
     async def start_campaign(self, event, campaign_id: str):
         campaign = self.campaigns.get(campaign_id)
         if not campaign:
-            await event.answer("Campaign not found!", alert=True)
+            await self.answer(event, "Campaign not found!", alert=True)
             return
         
         if campaign_id in self.running_campaigns:
-            await event.answer("Campaign is already running!", alert=True)
+            await self.answer(event, "Campaign is already running!", alert=True)
             return
         
-        campaign.active = True
-        self.campaigns[campaign_id] = campaign
-        self.db.save_campaign(campaign)
+        await self.set_campaign_active(campaign, True)
         
         # Start campaign in background
         asyncio.create_task(self.run_campaign(campaign_id))
         
-        await event.answer(f"Campaign '{campaign.name}' started!", alert=False)
-        await self.show_campaign_details(event, campaign_id)
+        await asyncio.gather(
+            self.answer(event, f"Campaign '{campaign.name}' started!", alert=False),
+            self.show_campaign_details(event, campaign_id)
+        )
     
     async def stop_campaign(self, event, campaign_id: str):
         campaign = self.campaigns.get(campaign_id)
         if not campaign:
-            await event.answer("Campaign not found!", alert=True)
+            await self.answer(event, "Campaign not found!", alert=True)
             return
         
-        campaign.active = False
-        self.campaigns[campaign_id] = campaign
-        self.db.save_campaign(campaign)
+        await self.set_campaign_active(campaign, False)
         self.running_campaigns.discard(campaign_id)
         
-        await event.answer(f"Campaign '{campaign.name}' stopped!", alert=False)
-        await self.show_campaign_details(event, campaign_id)
+        await asyncio.gather(
+            self.answer(event, f"Campaign '{campaign.name}' stopped!", alert=False),
+            self.show_campaign_details(event, campaign_id)
+        )
     
     async def show_campaign_details(self, event, campaign_id: str):
         campaign = self.campaigns.get(campaign_id)
         if not campaign:
-            await event.edit("Campaign not found!")
+            await self.edit_menu(event, "Campaign not found!")
             return
         
         status = "ACTIVE" if campaign.active else "INACTIVE"
@@ -1320,8 +2097,7 @@ Please upload your Telegram session file (.session).
         
         # Show account-specific options if campaign is active
         if campaign.active:
-            user_accounts = self.get_user_accounts(event.sender_id)
-            active_accounts = [acc for acc in user_accounts if acc.status == 'active']
+            active_accounts = self.get_user_active_accounts(event.sender_id)
             if active_accounts:
                 buttons.append([Button.inline("Start on Specific Account", f"select_account_for_campaign_{campaign_id}")])
         
@@ -1331,22 +2107,15 @@ Please upload your Telegram session file (.session).
             [Button.inline("Back", b"campaigns")]
         ])
         
-        await event.edit(details_text, buttons=buttons)
+        await self.edit_menu(event, details_text, buttons)
     
     async def show_account_details(self, event, account_name: str):
         account = self.accounts.get(account_name)
         if not account:
-            await event.edit("Account not found!")
+            await self.edit_menu(event, "Account not found!")
             return
         
-        status_info = {
-            'active': 'ACTIVE',
-            'flood_wait': 'FLOOD_WAIT',
-            'banned': 'BANNED', 
-            'error': 'ERROR'
-        }
-        
-        status = status_info.get(account.status, '⚪ Unknown')
+        status = STATUS_DISPLAY.get(account.status, '⚪ Unknown')
         
         details_text = f"""
 **{account_name}**
@@ -1364,8 +2133,7 @@ Please upload your Telegram session file (.session).
                 details_text += f"**Flood Wait Until:** {account.flood_wait_until.strftime('%H:%M:%S')}\n"
         
         # Get user's campaigns for this account
-        user_campaigns = self.get_user_campaigns(event.sender_id)
-        active_campaigns = [c for c in user_campaigns if c.active]
+        active_campaigns = self.get_user_active_campaigns(event.sender_id)
         
         buttons = [
             [Button.inline("Test Account", f"test_account_{account_name}")],
@@ -1392,7 +2160,7 @@ Please upload your Telegram session file (.session).
             [Button.inline("Back", b"accounts")]
         ])
         
-        await event.edit(details_text, buttons=buttons)
+        await self.edit_menu(event, details_text, buttons)
     
     async def delete_account(self, event, account_name: str):
         """Delete an account"""
@@ -1400,11 +2168,11 @@ Please upload your Telegram session file (.session).
         account = self.accounts.get(account_name)
         
         if not account or account.user_id != user_id:
-            await event.answer("Account not found or not owned by you!", alert=True)
+            await self.answer(event, "Account not found or not owned by you!", alert=True)
             return
         
         # Remove from memory and database
-        del self.accounts[account_name]
+        self.remove_account(account_name)
         if account_name in self.clients:
             client = self.clients[account_name]
             if client and hasattr(client, 'disconnect'):
@@ -1415,14 +2183,12 @@ Please upload your Telegram session file (.session).
             del self.clients[account_name]
         
         # Remove from database
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM accounts WHERE name = ?', (account_name,))
-        conn.commit()
-        conn.close()
+        await self.db.delete_account(account_name)
         
-        await event.answer(f"Account '{account_name}' deleted!", alert=False)
-        await self.show_accounts_menu(event)
+        await asyncio.gather(
+            self.answer(event, f"Account '{account_name}' deleted!", alert=False),
+            self.show_accounts_menu(event)
+        )
     
     async def delete_campaign(self, event, campaign_id: str):
         """Delete a campaign"""
@@ -1430,7 +2196,7 @@ Please upload your Telegram session file (.session).
         campaign = self.campaigns.get(campaign_id)
         
         if not campaign or campaign.user_id != user_id:
-            await event.answer("Campaign not found or not owned by you!", alert=True)
+            await self.answer(event, "Campaign not found or not owned by you!", alert=True)
             return
         
         # Stop if running
@@ -1438,21 +2204,19 @@ Please upload your Telegram session file (.session).
             self.running_campaigns.discard(campaign_id)
         
         # Remove from memory and database
-        del self.campaigns[campaign_id]
+        self.remove_campaign(campaign_id)
         
         # Remove from database
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM campaigns WHERE id = ?', (campaign_id,))
-        conn.commit()
-        conn.close()
+        await self.db.delete_campaign(campaign_id)
         
-        await event.answer(f"Campaign '{campaign.name}' deleted!", alert=False)
-        await self.show_campaigns_menu(event)
+        await asyncio.gather(
+            self.answer(event, f"Campaign '{campaign.name}' deleted!", alert=False),
+            self.show_campaigns_menu(event)
+        )
     
     async def handle_targets_import(self, event):
         """Handle targets import from file"""
-        await event.reply("📁 Send me a text file with target usernames/IDs (one per line)")
+        await self.reply(event, "📁 Send me a text file with target usernames/IDs (one per line)")
         self.user_state[event.sender_id] = {'action': 'awaiting_targets_file'}
     
     async def handle_campaign_interval_input(self, event):
@@ -1460,13 +2224,13 @@ Please upload your Telegram session file (.session).
         try:
             interval = int(event.raw_text.strip())
             if interval < 1:
-                await event.reply("Interval must be at least 1 second.")
+                await self.reply(event, "Interval must be at least 1 second.")
                 return
             
             user_state = self.user_state[event.sender_id]
             user_state['campaign_data']['interval'] = interval
             
-            await event.reply(f"Interval set to {interval} seconds.\n\nCampaign created successfully!")
+            await self.reply(event, f"Interval set to {interval} seconds.\n\nCampaign created successfully!")
             
             # Create and save campaign
             campaign_data = user_state['campaign_data']
@@ -1480,21 +2244,22 @@ Please upload your Telegram session file (.session).
                 user_id=event.sender_id
             )
             
-            self.campaigns[campaign.id] = campaign
-            self.db.save_campaign(campaign)
+            self.add_campaign(campaign)
+            await self.db.save_campaign(campaign)
             
             del self.user_state[event.sender_id]
             await self.show_campaigns_menu(event)
             
         except ValueError:
-            await event.reply("Please enter a valid number for the interval.")
+            await self.reply(event, "Please enter a valid number for the interval.")
     
     async def handle_keyword_filter_input(self, event):
         """Handle keyword filter input"""
-        keywords = [kw.strip() for kw in event.raw_text.split(',') if kw.strip()]
+        # Titles are matched lowercased, so store keywords lowercased and without duplicates
+        keywords = list(dict.fromkeys(filter(None, (kw.strip().lower() for kw in event.raw_text.split(',')))))
         
         if not keywords:
-            await event.reply("Please enter at least one keyword.")
+            await self.reply(event, "Please enter at least one keyword.")
             return
         
         user_state = self.user_state[event.sender_id]
@@ -1503,31 +2268,26 @@ Please upload your Telegram session file (.session).
         
         user_state['campaign_data']['filters']['keywords'] = keywords
         
-        await event.reply(f"Added keyword filters: {', '.join(keywords)}\n\nNow enter the message sending interval (seconds):")
+        await self.reply(event, f"Added keyword filters: {', '.join(keywords)}\n\nNow enter the message sending interval (seconds):")
         user_state['action'] = 'campaign_interval'
     
     async def handle_campaign_mode_selection(self, event, mode: str):
         """Handle target mode selection during campaign creation"""
         user_id = event.sender_id
         if user_id not in self.user_state or self.user_state[user_id].get('action') != 'campaign_mode':
-            await event.answer("Campaign creation session expired. Please start over.", alert=True)
+            await self.answer(event, "Campaign creation session expired. Please start over.", alert=True)
             return
         
         # Update campaign data with selected mode
         user_state = self.user_state[user_id]
         user_state['campaign_data']['mode'] = mode
         
-        mode_names = {
-            'groups': 'Groups Only',
-            'dms': 'DMs Only', 
-            'both': 'Both Groups & DMs'
-        }
-        
-        await event.edit(
-            f"Target mode set to: {mode_names[mode]}\n\n"
+        await self.edit_menu(
+            event,
+            f"Target mode set to: {_MODE_NAMES[mode]}\n\n"
             f"Step 4: Enter message sending interval (seconds):\n"
             f"Recommended: 5-10 seconds to avoid rate limiting",
-            buttons=[[Button.inline("Cancel", b"campaigns")]]
+            [[Button.inline("Cancel", b"campaigns")]]
         )
         
         user_state['action'] = 'campaign_interval'
@@ -1535,11 +2295,10 @@ Please upload your Telegram session file (.session).
     async def initiate_group_join(self, event):
         """Initiate group join process"""
         user_id = event.sender_id
-        user_accounts = self.get_user_accounts(user_id)
-        active_accounts = [acc for acc in user_accounts if acc.status == 'active']
+        active_accounts = self.get_user_active_accounts(user_id)
         
         if not active_accounts:
-            await event.answer("Add active accounts first before joining groups!", alert=True)
+            await self.answer(event, "Add active accounts first before joining groups!", alert=True)
             return
         
         self.user_state[user_id] = {'action': 'awaiting_group_links', 'groups': []}
@@ -1569,7 +2328,7 @@ Send your first group link/username:
         """
         
         buttons = [[Button.inline("Cancel", b"accounts")]]
-        await event.edit(instructions, buttons=buttons)
+        await self.edit_menu(event, instructions, buttons)
     
     async def handle_group_join_input(self, event):
         """Handle group link/username input"""
@@ -1583,7 +2342,7 @@ Send your first group link/username:
         
         if text.lower() == 'done':
             if not user_state.get('groups'):
-                await event.reply("Add at least one group before finishing.")
+                await self.reply(event, "Add at least one group before finishing.")
                 return
             
             await self.process_group_joins(event, user_state['groups'])
@@ -1593,50 +2352,26 @@ Send your first group link/username:
         group_identifier = self.process_group_identifier(text)
         if group_identifier:
             user_state['groups'].append(group_identifier)
-            await event.reply(f"Added: {group_identifier}\n\nSend another group link/username or type 'done':")
-        else:
-            await event.reply("Invalid format. Please send a valid group link or username.")
-    
-    def _clean_username(self, group: str) -> str:
-        """Clean username for Telegram API calls"""
-        if group.startswith('https://t.me/'):
-            return group.replace('https://t.me/', '')
-        elif group.startswith('@'):
-            return group[1:]
+            await self.reply(event, f"Added: {group_identifier}\n\nSend another group link/username or type 'done':")
         else:
-            return group
-    
-    def process_group_identifier(self, text: str) -> str:
-        """Process and validate group identifier"""
-        text = text.strip()
-        
-        # Handle t.me links
-        if 't.me/' in text:
-            if '/joinchat/' in text:
-                return text  # Join chat link
-            elif text.startswith(('https://t.me/', 'http://t.me/')):
-                return text
-            else:
-                return f"https://t.me/{text.split('/')[-1]}"
-        
-        # Handle username format
-        if text.startswith('@'):
-            return text[1:]  # Remove @ symbol
-        
-        # Plain username - validate alphanumeric + underscore
-        if text.replace('_', '').isalnum():
-            return text
-        
-        return None
+            await self.reply(event, "Invalid format. Please send a valid group link or username.")
+    
+    def process_group_identifier(self, text: str) -> Optional[str]:
+        """Normalize a group link/username to an invite link or a bare username; None if invalid"""
+        match = _GROUP_RE.fullmatch(text.strip())
+        if not match:
+            return None
+        if match['invite']:
+            return f"https://t.me/joinchat/{match['invite']}"
+        return match['user']
     
     async def process_group_joins(self, event, groups: List[str]):
         """Process joining multiple groups"""
         user_id = event.sender_id
-        user_accounts = self.get_user_accounts(user_id)
-        active_accounts = [acc for acc in user_accounts if acc.status == 'active']
+        active_accounts = self.get_user_active_accounts(user_id)
         
         if not active_accounts:
-            await event.reply("No active accounts available for joining groups!")
+            await self.reply(event, "No active accounts available for joining groups!")
             return
         
         # Clear user state
@@ -1646,76 +2381,86 @@ Send your first group link/username:
         successful_joins = 0
         failed_joins = 0
         
-        status_msg = await event.reply(f"**Starting to join {total_groups} groups...**\n\nPlease wait...")
+        status_msg = await self.reply(event, f"**Starting to join {total_groups} groups...**\n\nPlease wait...")
+        
+        join_accounts = await self.init_account_clients(active_accounts)
         
-        for i, group in enumerate(groups):
+        processed = 0
+        loop = asyncio.get_running_loop()
+        last_edit_ts = 0.0
+        last_text = None
+        
+        async def update_progress():
+            # At most one edit per PROGRESS_EDIT_INTERVAL, except the last one; never resend identical text
+            nonlocal last_edit_ts, last_text
+            done = processed == total_groups
+            now = loop.time()
+            if not done and now - last_edit_ts < PROGRESS_EDIT_INTERVAL:
+                return
+            
+            text = f"""
+**Group Join Progress**
+
+Successful: {successful_joins}
+Failed: {failed_joins}
+Progress: {processed}/{total_groups}
+
+{"Completed!" if done else "Processing..."}
+                """
+            if text == last_text:
+                return
+            last_edit_ts = now
+            last_text = text
             try:
-                # Use first available account for joining
-                account = active_accounts[0]
-                if not await self.init_account_client(account):
-                    continue
-                
-                client = self.clients[account.name]
-                
-                # Try to join the group
+                await self.edit(status_msg, text)
+            except _PROGRESS_EDIT_ERRORS:
+                pass
+            except Exception as e:
+                logging.warning(f"Could not update group join progress: {e}")
+        
+        async def join_runner(account: Account, account_groups: List[str]):
+            # Each account joins its own share one at a time; accounts run in parallel
+            nonlocal successful_joins, failed_joins, processed
+            client = self.clients[account.name]
+            
+            for i, group in enumerate(account_groups):
                 try:
-                    if '/joinchat/' in group:
-                        # Join via invite link
-                        from telethon.tl.functions.messages import ImportChatInviteRequest
-                        invite_hash = group.split('/joinchat/')[1]
-                        await client(ImportChatInviteRequest(invite_hash))
-                    else:
-                        # Join via username or public link
-                        from telethon.tl.functions.channels import JoinChannelRequest
-                        
-                        # Clean username - remove @ and https://t.me/ if present
-                        if group.startswith('https://t.me/'):
-                            username = group.replace('https://t.me/', '')
-                        elif group.startswith('@'):
-                            username = group[1:]
-                        else:
-                            username = group
-                        
-                        await client(JoinChannelRequest(username))
-                    
+                    await self.join_group(client, group)
                     successful_joins += 1
                     logging.info(f"Successfully joined group: {group}")
-                    
                 except Exception as join_error:
-                    failed_joins += 1
-                    error_msg = str(join_error).lower()
-                    if 'already' in error_msg:
+                    kind = _classify_error(join_error)
+                    if kind == 'already':
                         logging.info(f"ℹ️ Already member of group: {group}")
                         successful_joins += 1  # Count as success
-                        failed_joins -= 1
-                    elif 'flood' in error_msg:
-                        logging.warning(f"Flood wait for group: {group}")
-                        await asyncio.sleep(60)  # Wait 1 minute for flood
                     else:
-                        logging.error(f"Failed to join group {group}: {join_error}")
+                        failed_joins += 1
+                        if kind == 'flood':
+                            logging.warning(f"Flood wait for group: {group}")
+                            await asyncio.sleep(60)  # Wait 1 minute for flood
+                        else:
+                            logging.error(f"Failed to join group {group}: {join_error}")
                 
-                # Update status every few groups
-                if (i + 1) % 3 == 0 or i == len(groups) - 1:
-                    try:
-                        await status_msg.edit(f"""
-**Group Join Progress**
-
-Successful: {successful_joins}
-Failed: {failed_joins}
-Progress: {i + 1}/{total_groups}
-
-{"Completed!" if i == len(groups) - 1 else "Processing..."}
-                        """)
-                    except:
-                        pass
+                processed += 1
+                await update_progress()
                 
-                # Wait between joins to avoid rate limiting
-                if i < len(groups) - 1:
-                    await asyncio.sleep(random.uniform(5, 10))
-                    
-            except Exception as e:
-                logging.error(f"Error processing group {group}: {e}")
-                failed_joins += 1
+                # Wait between joins on this account to avoid rate limiting
+                if i < len(account_groups) - 1:
+                    await asyncio.sleep(_JOIN_JITTER[next(_JITTER_IDX) & (_JITTER_SIZE - 1)])
+        
+        if join_accounts:
+            # Round-robin the groups over every account that connected
+            shards = [(account, groups[i::len(join_accounts)]) for i, account in enumerate(join_accounts)]
+            results = await asyncio.gather(
+                *(join_runner(account, account_groups) for account, account_groups in shards if account_groups),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logging.error(f"Error processing group joins: {result}")
+        
+        # Groups that were never attempted count as failed
+        failed_joins += total_groups - processed
         
         # Final status message
         final_msg = f"""
@@ -1737,9 +2482,24 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         ]
         
         try:
-            await status_msg.edit(final_msg, buttons=buttons)
-        except:
-            await event.reply(final_msg, buttons=buttons)
+            await self.edit(status_msg, final_msg, buttons=buttons)
+        except errors.RPCError:
+            await self.reply(event, final_msg, buttons=buttons)
+    
+    async def join_group(self, client: TelegramClient, group: str):
+        """Join a group by invite link, public link or username"""
+        match = _GROUP_RE.fullmatch(group)
+        if not match:
+            raise ValueError(f"Invalid group identifier: {group}")
+        
+        if match['invite']:
+            # Join via invite link
+            from telethon.tl.functions.messages import ImportChatInviteRequest
+            await client(ImportChatInviteRequest(match['invite']))
+        else:
+            # Join via username or public link
+            from telethon.tl.functions.channels import JoinChannelRequest
+            await client(JoinChannelRequest(match['user']))
     
     async def activate_campaign(self, event, campaign_id: str):
         """Activate a campaign"""
@@ -1747,15 +2507,15 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         campaign = self.campaigns.get(campaign_id)
         
         if not campaign or campaign.user_id != user_id:
-            await event.answer("Campaign not found or not owned by you!", alert=True)
+            await self.answer(event, "Campaign not found or not owned by you!", alert=True)
             return
         
-        campaign.active = True
-        self.campaigns[campaign_id] = campaign
-        self.db.save_campaign(campaign)
+        await self.set_campaign_active(campaign, True)
         
-        await event.answer(f"Campaign '{campaign.name}' activated!", alert=False)
-        await self.show_campaign_details(event, campaign_id)
+        await asyncio.gather(
+            self.answer(event, f"Campaign '{campaign.name}' activated!", alert=False),
+            self.show_campaign_details(event, campaign_id)
+        )
     
     async def deactivate_campaign(self, event, campaign_id: str):
         """Deactivate a campaign"""
@@ -1763,7 +2523,7 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         campaign = self.campaigns.get(campaign_id)
         
         if not campaign or campaign.user_id != user_id:
-            await event.answer("Campaign not found or not owned by you!", alert=True)
+            await self.answer(event, "Campaign not found or not owned by you!", alert=True)
             return
         
         # Stop campaign if running
@@ -1771,17 +2531,15 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
             self.running_campaigns.discard(campaign_id)
         
         # Stop all account-specific campaigns
-        user_accounts = self.get_user_accounts(user_id)
-        for account in user_accounts:
-            running_key = f"{account.name}_{campaign_id}"
-            self.running_campaigns.discard(running_key)
+        for account_name in list(self.campaign_to_accounts.get(campaign_id, ())):
+            self.clear_account_run(account_name, campaign_id)
         
-        campaign.active = False
-        self.campaigns[campaign_id] = campaign
-        self.db.save_campaign(campaign)
+        await self.set_campaign_active(campaign, False)
         
-        await event.answer(f"Campaign '{campaign.name}' deactivated!", alert=False)
-        await self.show_campaign_details(event, campaign_id)
+        await asyncio.gather(
+            self.answer(event, f"Campaign '{campaign.name}' deactivated!", alert=False),
+            self.show_campaign_details(event, campaign_id)
+        )
     
     async def select_account_for_campaign(self, event, campaign_id: str):
         """Show account selection for starting a specific campaign"""
@@ -1789,42 +2547,43 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         campaign = self.campaigns.get(campaign_id)
         
         if not campaign or campaign.user_id != user_id:
-            await event.answer("Campaign not found or not owned by you!", alert=True)
+            await self.answer(event, "Campaign not found or not owned by you!", alert=True)
             return
         
         if not campaign.active:
-            await event.answer("Campaign must be activated first!", alert=True)
+            await self.answer(event, "Campaign must be activated first!", alert=True)
             return
         
-        user_accounts = self.get_user_accounts(user_id)
-        active_accounts = [acc for acc in user_accounts if acc.status == 'active']
+        active_accounts = self.get_user_active_accounts(user_id)
         
         if not active_accounts:
-            await event.answer("No active accounts found!", alert=True)
+            await self.answer(event, "No active accounts found!", alert=True)
             return
         
-        accounts_text = f"**Select Account for Campaign: {campaign.name}**\n\n"
-        accounts_text += "Choose which account to start this campaign on:\n\n"
-        
+        text_parts = [
+            f"**Select Account for Campaign: {campaign.name}**\n\n"
+            "Choose which account to start this campaign on:\n\n"
+        ]
         buttons = []
         
+        running_campaigns = self.running_campaigns
         for account in active_accounts:
-            running_key = f"{account.name}_{campaign_id}"
-            status_icon = "⏸️" if running_key in self.running_campaigns else "▶️"
-            status_text = "RUNNING" if running_key in self.running_campaigns else "STOPPED"
+            running = f"{account.name}_{campaign_id}" in running_campaigns
             
-            accounts_text += f"**{account.name}** [{status_text}]\n"
-            accounts_text += f"Phone: {account.phone_number or 'Unknown'}\n"
-            accounts_text += f"Messages sent: {account.messages_sent}\n\n"
+            text_parts.append(
+                f"**{account.name}** [{'RUNNING' if running else 'STOPPED'}]\n"
+                f"Phone: {account.phone_number or 'Unknown'}\n"
+                f"Messages sent: {account.messages_sent}\n\n"
+            )
             
-            if running_key in self.running_campaigns:
+            if running:
                 buttons.append([Button.inline(f"⏸️ Stop on {account.name}", f"stop_account_campaign_{account.name}_{campaign_id}")])
             else:
                 buttons.append([Button.inline(f"▶️ Start on {account.name}", f"start_account_campaign_{account.name}_{campaign_id}")])
         
         buttons.append([Button.inline("Back to Campaign", f"campaign_{campaign_id}")])
         
-        await event.edit(accounts_text, buttons=buttons)
+        await self.edit_menu(event, "".join(text_parts), buttons)
     
     async def start_account_campaign(self, event, account_name: str, campaign_id: str):
         """Start a specific campaign with a specific account"""
@@ -1833,35 +2592,35 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         campaign = self.campaigns.get(campaign_id)
         
         if not account or account.user_id != user_id:
-            await event.answer("Account not found or not owned by you!", alert=True)
+            await self.answer(event, "Account not found or not owned by you!", alert=True)
             return
             
         if not campaign or campaign.user_id != user_id:
-            await event.answer("Campaign not found or not owned by you!", alert=True)
+            await self.answer(event, "Campaign not found or not owned by you!", alert=True)
             return
         
         if account.status != "active":
-            await event.answer(f"Account {account_name} is not active (Status: {account.status})", alert=True)
+            await self.answer(event, f"Account {account_name} is not active (Status: {account.status})", alert=True)
             return
             
         # Create a unique running key for this account-campaign combination
         running_key = f"{account_name}_{campaign_id}"
         
         if running_key in self.running_campaigns:
-            await event.answer("This campaign is already running on this account!", alert=True)
+            await self.answer(event, "This campaign is already running on this account!", alert=True)
             return
         
         # Start the campaign with only this account
-        self.running_campaigns.add(running_key)
-        campaign.active = True
-        self.campaigns[campaign_id] = campaign
-        self.db.save_campaign(campaign)
+        stop = self.mark_account_run(account_name, campaign_id)
+        await self.set_campaign_active(campaign, True)
         
         # Start campaign in background with specific account
-        asyncio.create_task(self.run_account_campaign(campaign_id, account_name))
+        asyncio.create_task(self.run_account_campaign(campaign_id, account_name, stop))
         
-        await event.answer(f"▶️ Campaign '{campaign.name}' started on account '{account_name}'!", alert=False)
-        await self.show_account_details(event, account_name)
+        await asyncio.gather(
+            self.answer(event, f"▶️ Campaign '{campaign.name}' started on account '{account_name}'!", alert=False),
+            self.show_account_details(event, account_name)
+        )
     
     async def stop_account_campaign(self, event, account_name: str, campaign_id: str):
         """Stop a specific campaign on a specific account"""
@@ -1870,24 +2629,26 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         campaign = self.campaigns.get(campaign_id)
         
         if not account or account.user_id != user_id:
-            await event.answer("Account not found or not owned by you!", alert=True)
+            await self.answer(event, "Account not found or not owned by you!", alert=True)
             return
             
         if not campaign or campaign.user_id != user_id:
-            await event.answer("Campaign not found or not owned by you!", alert=True)
+            await self.answer(event, "Campaign not found or not owned by you!", alert=True)
             return
         
         # Create a unique running key for this account-campaign combination
         running_key = f"{account_name}_{campaign_id}"
         
         if running_key not in self.running_campaigns:
-            await event.answer("This campaign is not running on this account!", alert=True)
+            await self.answer(event, "This campaign is not running on this account!", alert=True)
             return
         
-        self.running_campaigns.discard(running_key)
+        self.clear_account_run(account_name, campaign_id)
         
-        await event.answer(f"⏸️ Campaign '{campaign.name}' stopped on account '{account_name}'!", alert=False)
-        await self.show_account_details(event, account_name)
+        await asyncio.gather(
+            self.answer(event, f"⏸️ Campaign '{campaign.name}' stopped on account '{account_name}'!", alert=False),
+            self.show_account_details(event, account_name)
+        )
     
     async def start_all_campaigns_for_account(self, event, account_name: str):
         """Start all active campaigns for a specific account"""
@@ -1895,32 +2656,31 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         account = self.accounts.get(account_name)
         
         if not account or account.user_id != user_id:
-            await event.answer("Account not found or not owned by you!", alert=True)
+            await self.answer(event, "Account not found or not owned by you!", alert=True)
             return
         
         if account.status != "active":
-            await event.answer(f"Account {account_name} is not active (Status: {account.status})", alert=True)
+            await self.answer(event, f"Account {account_name} is not active (Status: {account.status})", alert=True)
             return
         
-        user_campaigns = self.get_user_campaigns(user_id)
-        active_campaigns = [c for c in user_campaigns if c.active]
+        active_campaigns = self.get_user_active_campaigns(user_id)
         
         if not active_campaigns:
-            await event.answer("No active campaigns found!", alert=True)
+            await self.answer(event, "No active campaigns found!", alert=True)
             return
         
         started_count = 0
         for campaign in active_campaigns:
             running_key = f"{account_name}_{campaign.id}"
             if running_key not in self.running_campaigns:
-                self.running_campaigns.add(running_key)
-                asyncio.create_task(self.run_account_campaign(campaign.id, account_name))
+                stop = self.mark_account_run(account_name, campaign.id)
+                asyncio.create_task(self.run_account_campaign(campaign.id, account_name, stop))
                 started_count += 1
         
         if started_count > 0:
-            await event.answer(f"Started {started_count} campaigns on account '{account_name}'!", alert=False)
+            await self.answer(event, f"Started {started_count} campaigns on account '{account_name}'!", alert=False)
         else:
-            await event.answer("All campaigns are already running on this account!", alert=True)
+            await self.answer(event, "All campaigns are already running on this account!", alert=True)
         
         await self.show_account_details(event, account_name)
     
@@ -1930,35 +2690,36 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         account = self.accounts.get(account_name)
         
         if not account or account.user_id != user_id:
-            await event.answer("Account not found or not owned by you!", alert=True)
+            await self.answer(event, "Account not found or not owned by you!", alert=True)
             return
         
-        user_campaigns = self.get_user_campaigns(user_id)
-        active_campaigns = [c for c in user_campaigns if c.active]
+        active_campaigns = self.get_user_active_campaigns(user_id)
         
-        campaigns_text = f"**Campaigns for Account: {account_name}**\n\n"
+        text_parts = [f"**Campaigns for Account: {account_name}**\n\n"]
         buttons = []
         
         if not active_campaigns:
-            campaigns_text += "No active campaigns found."
+            text_parts.append("No active campaigns found.")
             buttons.append([Button.inline("Create Campaign", b"create_campaign")])
         else:
+            running_campaigns = self.running_campaigns
             for campaign in active_campaigns:
-                running_key = f"{account_name}_{campaign.id}"
-                running_status = "RUNNING" if running_key in self.running_campaigns else "STOPPED"
+                running = f"{account_name}_{campaign.id}" in running_campaigns
                 
-                campaigns_text += f"**{campaign.name}** [{running_status}]\n"
-                campaigns_text += f"Mode: {campaign.mode} | Interval: {campaign.interval}s\n"
-                campaigns_text += f"Messages: {len(campaign.messages)}\n\n"
+                text_parts.append(
+                    f"**{campaign.name}** [{'RUNNING' if running else 'STOPPED'}]\n"
+                    f"Mode: {campaign.mode} | Interval: {campaign.interval}s\n"
+                    f"Messages: {len(campaign.messages)}\n\n"
+                )
                 
-                if running_key in self.running_campaigns:
+                if running:
                     buttons.append([Button.inline(f"⏸️ Stop: {campaign.name}", f"stop_account_campaign_{account_name}_{campaign.id}")])
                 else:
                     buttons.append([Button.inline(f"▶️ Start: {campaign.name}", f"start_account_campaign_{account_name}_{campaign.id}")])
         
         buttons.append([Button.inline("Back to Account", f"account_{account_name}")])
         
-        await event.edit(campaigns_text, buttons=buttons)
+        await self.edit_menu(event, "".join(text_parts), buttons)
     
     async def test_account(self, event, account_name: str):
         """Test an account by sending a test message to the user"""
@@ -1966,39 +2727,43 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
         account = self.accounts.get(account_name)
         
         if not account or account.user_id != user_id:
-            await event.answer("Account not found or not owned by you!", alert=True)
+            await self.answer(event, "Account not found or not owned by you!", alert=True)
             return
         
         if account.status != "active":
-            await event.answer(f"Account {account_name} is not active (Status: {account.status})", alert=True)
+            await self.answer(event, f"Account {account_name} is not active (Status: {account.status})", alert=True)
             return
         
         # Initialize the account client if needed
         if not await self.init_account_client(account):
-            await event.answer("Failed to initialize account client!", alert=True)
+            await self.answer(event, "Failed to initialize account client!", alert=True)
             return
         
         try:
             client = self.clients[account_name]
             # Send a test message to the user who requested the test
             await client.send_message(user_id, f"Test message from account: {account_name}\nAccount is working properly!")
-            await event.answer(f"Test successful! Check your messages.", alert=False)
+            await self.answer(event, f"Test successful! Check your messages.", alert=False)
         except Exception as e:
             logging.error(f"Test failed for account {account_name}: {e}")
-            await event.answer(f"Test failed: {str(e)}", alert=True)
+            await self.answer(event, f"Test failed: {str(e)}", alert=True)
     
-    async def run_account_campaign(self, campaign_id: str, account_name: str):
+    async def run_account_campaign(self, campaign_id: str, account_name: str, stop: asyncio.Event):
         """Run a campaign with a specific account"""
-        running_key = f"{account_name}_{campaign_id}"
-        
-        if running_key not in self.running_campaigns:
+        # Extra runs on a busy account wait here and re-check that they are still wanted
+        async with self._per_account_sem[account_name]:
+            await self._run_account_campaign(campaign_id, account_name, stop)
+    
+    async def _run_account_campaign(self, campaign_id: str, account_name: str, stop: asyncio.Event):
+        # Stopped while queued; a restart has its own event and task
+        if stop.is_set():
             return
         
         campaign = self.campaigns.get(campaign_id)
         account = self.accounts.get(account_name)
         
         if not campaign or not account:
-            self.running_campaigns.discard(running_key)
+            self.clear_account_run(account_name, campaign_id, stop)
             return
         
         logging.info(f"Starting account-specific campaign: {campaign.name} on {account_name}")
@@ -2007,27 +2772,29 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
             # Initialize client for this account
             if not await self.init_account_client(account):
                 logging.error(f"Failed to initialize client for account {account_name}")
-                self.running_campaigns.discard(running_key)
                 return
             
             client = self.clients[account_name]
             
-            # Get targets using this client
-            targets = await self.get_targets(client, campaign.mode, campaign.filters)
-            
-            if not targets:
-                logging.warning(f"No targets found for campaign {campaign.name} on account {account_name}")
-                self.running_campaigns.discard(running_key)
-                return
-            
-            # Shuffle targets for better distribution
-            random.shuffle(targets)
+            # Stream targets from this client, shuffled within a bounded window
+            targets = _shuffle_window(
+                self.iter_targets(client, campaign.mode, campaign.filters), TARGET_SHUFFLE_WINDOW
+            )
             
             sent_count = 0
             failed_count = 0
+            messages = _message_stream(campaign.messages)
             
-            for target in targets:
-                if running_key not in self.running_campaigns:
+            # Loop-invariant lookups bound once for the send loop
+            loop = asyncio.get_running_loop()
+            base_interval = max(campaign.interval, 3)  # Minimum 3 seconds
+            stats = self.stats
+            send_message = self.send_message_to_target
+            record_activity = self.record_activity
+            count_account_send = self.count_account_send
+            target = None
+            async for target in targets:
+                if stop.is_set():
                     break
                 
                 # Check if account is still available
@@ -2036,48 +2803,40 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
                     break
                 
                 # Select message
-                message = random.choice(campaign.messages) if campaign.messages else "Hello!"
+                message = next(messages)
                 
                 try:
-                    success = await self.send_message_to_target(client, target, message)
+                    success = await send_message(client, target, message)
                     
                     if success:
                         sent_count += 1
                         account.messages_sent += 1
-                        account.last_used = datetime.now()
-                        self.stats['total_sent'] += 1
+                        stats['total_sent'] += 1
+                        count_account_send(account, loop.time())
                     else:
                         failed_count += 1
-                        self.stats['total_failed'] += 1
+                        stats['total_failed'] += 1
                     
                     # Log activity
-                    self.db.log_activity(
-                        account_name, campaign_id, target['id'], 
-                        target['type'], success
-                    )
-                    
-                    # Save account stats
-                    self.db.save_account(account)
+                    record_activity(account_name, campaign_id, target, success)
                     
                 except errors.FloodWaitError as e:
                     if e.seconds > FLOOD_WAIT_TOLERANCE:
                         # Mark account as flood waited
-                        account.status = "flood_wait"
+                        self.set_account_status(account, "flood_wait")
                         account.flood_wait_until = datetime.now() + timedelta(seconds=e.seconds)
-                        self.db.save_account(account)
+                        await self.db.save_account(account)
                         
                         # Log flood wait
-                        self.db.log_activity(
-                            account_name, campaign_id, target['id'], 
-                            target['type'], False, f"Flood wait: {e.seconds}s"
-                        )
+                        record_activity(account_name, campaign_id, target, False, f"Flood wait: {e.seconds}s")
                         
                         logging.warning(f"Account {account_name} hit flood wait: {e.seconds}s")
                         break
                     else:
                         # Wait for the flood wait period
                         logging.info(f"Short flood wait for {account_name}: {e.seconds}s")
-                        await asyncio.sleep(e.seconds)
+                        if await _sleep_or_stop(stop, e.seconds):
+                            break
                         continue
                 
                 except Exception as e:
@@ -2085,38 +2844,37 @@ Success rate: {(successful_joins/(successful_joins+failed_joins)*100):.1f}%
                     failed_count += 1
                     
                     # Log error
-                    self.db.log_activity(
-                        account_name, campaign_id, target['id'], 
-                        target['type'], False, str(e)
-                    )
+                    record_activity(account_name, campaign_id, target, False, str(e))
                     
                     # Check for critical errors
-                    if "banned" in str(e).lower() or "terminated" in str(e).lower():
-                        account.status = "banned"
-                        self.db.save_account(account)
+                    if _classify_error(e) == 'banned':
+                        self.set_account_status(account, "banned")
+                        await self.db.save_account(account)
                         logging.error(f"Account {account_name} appears to be banned")
                         break
                 
-                # Enhanced wait between messages to prevent rate limiting
-                base_interval = max(campaign.interval, 3)  # Minimum 3 seconds
-                # Add random variation to avoid detection
-                random_delay = random.uniform(0.5, 2.0)
-                total_delay = base_interval + random_delay
+                # Enhanced wait between messages to prevent rate limiting, with random variation to avoid detection
+                total_delay = base_interval + _SEND_JITTER[next(_JITTER_IDX) & (_JITTER_SIZE - 1)]
                 
                 logging.debug(f"⏱️ Waiting {total_delay:.1f} seconds before next message")
-                await asyncio.sleep(total_delay)
+                if await _sleep_or_stop(stop, total_delay):
+                    break
+            
+            if target is None:
+                logging.warning(f"No targets found for campaign {campaign.name} on account {account_name}")
+                return
             
             logging.info(f"Campaign {campaign.name} on {account_name} completed: {sent_count} sent, {failed_count} failed")
             
         except Exception as e:
             logging.error(f"Fatal error in account campaign {account_name}: {e}")
-            account.status = "error"
+            self.set_account_status(account, "error")
             account.errors_count += 1
-            self.db.save_account(account)
+            await self.db.save_account(account)
         
         finally:
-            # Remove from running campaigns
-            self.running_campaigns.discard(running_key)
+            # Remove from running campaigns, unless a newer run already took the key over
+            self.clear_account_run(account_name, campaign_id, stop)
             logging.info(f"Account campaign {account_name}_{campaign_id} finished")
 
 async def main():
@@ -2127,6 +2885,10 @@ async def main():
         return
     
     try:
+        # Load existing data
+        await bot.load_accounts()
+        await bot.load_campaigns()
+        
         success = await bot.init_bot()
         if not success:
             logging.error("Failed to initialize bot")
@@ -2149,6 +2911,16 @@ async def main():
             for client in bot.clients.values():
                 if client:
                     await client.disconnect()
+        await bot.stop_db_writer()
+        await bot.flush_db_queue()
+        await bot.db.close()
 
 if __name__ == "__main__":
+    # uvloop is optional and unavailable on Windows; fall back to the default loop
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        uvloop.install()
     asyncio.run(main())
\ No newline at end of file